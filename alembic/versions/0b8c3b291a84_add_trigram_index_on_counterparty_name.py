@@ -0,0 +1,38 @@
+"""Add trigram index on counterparty name
+
+Revision ID: 0b8c3b291a84
+Revises: 22c663a99719
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0b8c3b291a84"
+down_revision: Union[str, None] = "22c663a99719"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # pg_trgm есть только в Postgres, в SQLite бот ищет по индексу в памяти.
+    if op.get_context().dialect.name != "postgresql":
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index(
+        "ix_counterparties_name_trgm",
+        "counterparties",
+        ["name"],
+        postgresql_using="gin",
+        postgresql_ops={"name": "gin_trgm_ops"},
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    if op.get_context().dialect.name != "postgresql":
+        return
+    op.drop_index("ix_counterparties_name_trgm", table_name="counterparties")
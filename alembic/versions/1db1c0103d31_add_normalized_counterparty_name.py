@@ -0,0 +1,100 @@
+"""Add normalized counterparty name
+
+Revision ID: 1db1c0103d31
+Revises: 0b8c3b291a84
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import context, op
+
+# revision identifiers, used by Alembic.
+revision: str = "1db1c0103d31"
+down_revision: Union[str, None] = "0b8c3b291a84"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+REQUEST_TABLES = ("cash_requests", "no_cash_request")
+
+counterparties = sa.table(
+    "counterparties",
+    sa.column("id", sa.Integer),
+    sa.column("name", sa.String),
+    sa.column("normalized_name", sa.String),
+)
+
+
+def normalize(name):
+    # Копия models.data_base.normalize_counterparty_name на момент миграции.
+    if name is None:
+        return None
+    return " ".join(name.split()).casefold()
+
+
+def upgrade() -> None:
+    if context.is_offline_mode():
+        raise RuntimeError(
+            "Миграция переносит данные и не работает в режиме --sql."
+        )
+    op.add_column("counterparties", sa.Column("normalized_name", sa.String()))
+    connection = op.get_bind()
+    rows = connection.execute(
+        sa.select(counterparties.c.id, counterparties.c.name).order_by(
+            counterparties.c.id
+        )
+    ).all()
+    # Дубли сливаются в контрагента с наименьшим id, заявки переносятся
+    # на него.
+    keepers, keys, duplicates = {}, [], []
+    for counterparty_id, name in rows:
+        key = normalize(name)
+        if key is None:
+            continue
+        keeper_id = keepers.setdefault(key, counterparty_id)
+        if keeper_id == counterparty_id:
+            keys.append({"b_id": counterparty_id, "b_key": key})
+        else:
+            duplicates.append(
+                {"b_id": counterparty_id, "b_keeper_id": keeper_id}
+            )
+    if duplicates:
+        for table in REQUEST_TABLES:
+            requests = sa.table(table, sa.column("counterparty_id"))
+            connection.execute(
+                requests.update()
+                .where(requests.c.counterparty_id == sa.bindparam("b_id"))
+                .values(counterparty_id=sa.bindparam("b_keeper_id")),
+                duplicates,
+            )
+        connection.execute(
+            counterparties.delete().where(
+                counterparties.c.id == sa.bindparam("b_id")
+            ),
+            duplicates,
+        )
+    if keys:
+        connection.execute(
+            counterparties.update()
+            .where(counterparties.c.id == sa.bindparam("b_id"))
+            .values(normalized_name=sa.bindparam("b_key")),
+            keys,
+        )
+    op.create_index(
+        "ix_counterparties_normalized_name",
+        "counterparties",
+        ["normalized_name"],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    # Слитые дубли не восстанавливаются.
+    op.drop_index(
+        "ix_counterparties_normalized_name", table_name="counterparties"
+    )
+    with op.batch_alter_table("counterparties") as batch_op:
+        batch_op.drop_column("normalized_name")
@@ -0,0 +1,43 @@
+"""Add created_at to requests
+
+Revision ID: 22c663a99719
+Revises: 738149841e10
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "22c663a99719"
+down_revision: Union[str, None] = "738149841e10"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+REQUEST_TABLES = ("cash_requests", "no_cash_request")
+
+
+def upgrade() -> None:
+    for table in REQUEST_TABLES:
+        # Время создания старых заявок неизвестно, у них остается NULL.
+        # Значение по умолчанию задается отдельно: SQLite не добавляет
+        # колонку с непостоянным значением по умолчанию.
+        op.add_column(
+            table, sa.Column("created_at", sa.DateTime(timezone=True))
+        )
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column(
+                "created_at", server_default=sa.text("CURRENT_TIMESTAMP")
+            )
+        op.create_index(f"ix_{table}_created_at", table, ["created_at"])
+
+
+def downgrade() -> None:
+    for table in REQUEST_TABLES:
+        op.drop_index(f"ix_{table}_created_at", table_name=table)
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column("created_at")
@@ -0,0 +1,149 @@
+"""Add daily request totals
+
+Revision ID: 29898211e85f
+Revises: 1db1c0103d31
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "29898211e85f"
+down_revision: Union[str, None] = "1db1c0103d31"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Таблица заявок, тип кассы и поле ссылки на заявку в журнале.
+REQUEST_TABLES = (
+    ("cash_requests", "cash", "cash_request_id"),
+    ("no_cash_request", "non_cash", "no_cash_request_id"),
+)
+
+balance_movements = sa.table(
+    "balance_movements",
+    sa.column("cash_desk", sa.String),
+    sa.column("amount", sa.Integer),
+    sa.column("reason", sa.String),
+    sa.column("created_at", sa.DateTime),
+    sa.column("cash_request_id", sa.Integer),
+    sa.column("no_cash_request_id", sa.Integer),
+)
+
+
+def day_of(column):
+    # CAST(... AS DATE) в SQLite возвращает число, а не дату.
+    if op.get_context().dialect.name == "sqlite":
+        return sa.func.date(column)
+    return sa.cast(column, sa.Date)
+
+
+def totals_select():
+    """Итоги по дням из существующих заявок и журнала оплат.
+
+    Оплаты берутся из журнала по дню списания. Оплаченные заявки без
+    записи в журнале считаются оплаченными в день создания. Заявки без
+    created_at в итоги не попадают.
+    """
+
+    parts = []
+    for table_name, request_type, request_key in REQUEST_TABLES:
+        requests = sa.table(
+            table_name,
+            sa.column("id", sa.Integer),
+            sa.column("amount", sa.Integer),
+            sa.column("status", sa.Boolean),
+            sa.column("created_at", sa.DateTime),
+        )
+        parts.append(
+            sa.select(
+                day_of(requests.c.created_at).label("day"),
+                sa.literal(request_type).label("request_type"),
+                sa.literal(1).label("created_count"),
+                sa.func.coalesce(requests.c.amount, 0).label("created_amount"),
+                sa.literal(0).label("paid_count"),
+                sa.literal(0).label("paid_amount"),
+            ).where(requests.c.created_at.isnot(None))
+        )
+        paid_in_ledger = sa.exists().where(
+            balance_movements.c[request_key] == requests.c.id,
+            balance_movements.c.reason == "payment",
+        )
+        parts.append(
+            sa.select(
+                day_of(requests.c.created_at),
+                sa.literal(request_type),
+                sa.literal(0),
+                sa.literal(0),
+                sa.literal(1),
+                sa.func.coalesce(requests.c.amount, 0),
+            ).where(
+                requests.c.created_at.isnot(None),
+                requests.c.status.is_(True),
+                ~paid_in_ledger,
+            )
+        )
+    parts.append(
+        sa.select(
+            day_of(balance_movements.c.created_at),
+            balance_movements.c.cash_desk,
+            sa.literal(0),
+            sa.literal(0),
+            sa.literal(1),
+            -balance_movements.c.amount,
+        ).where(balance_movements.c.reason == "payment")
+    )
+    rows = sa.union_all(*parts).subquery()
+    return sa.select(
+        rows.c.day,
+        rows.c.request_type,
+        sa.func.sum(rows.c.created_count),
+        sa.func.sum(rows.c.created_amount),
+        sa.func.sum(rows.c.paid_count),
+        sa.func.sum(rows.c.paid_amount),
+    ).group_by(rows.c.day, rows.c.request_type)
+
+
+def upgrade() -> None:
+    daily_request_totals = op.create_table(
+        "daily_request_totals",
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("request_type", sa.String(), nullable=False),
+        sa.Column(
+            "created_count", sa.Integer(), server_default="0", nullable=False
+        ),
+        sa.Column(
+            "created_amount",
+            sa.BigInteger(),
+            server_default="0",
+            nullable=False,
+        ),
+        sa.Column(
+            "paid_count", sa.Integer(), server_default="0", nullable=False
+        ),
+        sa.Column(
+            "paid_amount", sa.BigInteger(), server_default="0", nullable=False
+        ),
+        sa.PrimaryKeyConstraint("day", "request_type"),
+    )
+    op.execute(
+        daily_request_totals.insert().from_select(
+            [
+                "day",
+                "request_type",
+                "created_count",
+                "created_amount",
+                "paid_count",
+                "paid_amount",
+            ],
+            totals_select(),
+        )
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("daily_request_totals")
@@ -0,0 +1,44 @@
+"""Add claim columns to requests
+
+Revision ID: 738149841e10
+Revises: 9bd6bcc9adc1
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "738149841e10"
+down_revision: Union[str, None] = "9bd6bcc9adc1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+REQUEST_TABLES = ("cash_requests", "no_cash_request")
+
+
+def upgrade() -> None:
+    for table in REQUEST_TABLES:
+        # batch_alter_table нужен SQLite для добавления внешнего ключа.
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.add_column(sa.Column("claimed_by", sa.BigInteger()))
+            batch_op.add_column(
+                sa.Column("claimed_at", sa.DateTime(timezone=True))
+            )
+            batch_op.create_foreign_key(
+                f"fk_{table}_claimed_by_users", "users", ["claimed_by"], ["id"]
+            )
+
+
+def downgrade() -> None:
+    for table in REQUEST_TABLES:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_constraint(
+                f"fk_{table}_claimed_by_users", type_="foreignkey"
+            )
+            batch_op.drop_column("claimed_at")
+            batch_op.drop_column("claimed_by")
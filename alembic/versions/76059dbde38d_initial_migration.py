@@ -20,12 +20,66 @@ depends_on: Union[str, Sequence[str], None] = None
 
 
 def upgrade() -> None:
-    # ### commands auto generated by Alembic - please adjust! ###
-    pass
-    # ### end Alembic commands ###
+    # Раньше таблицы создавались при импорте моделей, и миграция была
+    # пустой. Для новой базы схема создается здесь, в исходном виде:
+    # следующие ревизии меняют тип id на BIGINT.
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("telegram_id", sa.String(), nullable=True),
+        sa.Column("username", sa.String(), nullable=True),
+        sa.Column("cash_balance", sa.Integer(), nullable=True),
+        sa.Column("non_cash_balance", sa.Integer(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index(
+        "ix_users_telegram_id", "users", ["telegram_id"], unique=True
+    )
+    op.create_index("ix_users_username", "users", ["username"], unique=True)
+    op.create_table(
+        "counterparties",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(), nullable=True),
+        sa.Column("phone_or_card", sa.String(), nullable=True),
+        sa.Column("bank", sa.String(), nullable=True),
+        sa.Column("is_individual", sa.Boolean(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_counterparties_id", "counterparties", ["id"])
+    op.create_table(
+        "cash_requests",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("counterparty_id", sa.Integer(), nullable=True),
+        sa.Column("amount", sa.Integer(), nullable=True),
+        sa.Column("comment", sa.String(), nullable=True),
+        sa.Column("status", sa.Boolean(), nullable=True),
+        sa.Column("check_file", sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(["counterparty_id"], ["counterparties.id"]),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_cash_requests_id", "cash_requests", ["id"])
+    op.create_table(
+        "no_cash_request",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("counterparty_id", sa.Integer(), nullable=True),
+        sa.Column("amount", sa.Integer(), nullable=True),
+        sa.Column("invoice_path", sa.String(), nullable=True),
+        sa.Column("comment", sa.String(), nullable=True),
+        sa.Column("status", sa.Boolean(), nullable=True),
+        sa.Column("payment_slip", sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(["counterparty_id"], ["counterparties.id"]),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_no_cash_request_id", "no_cash_request", ["id"])
 
 
 def downgrade() -> None:
-    # ### commands auto generated by Alembic - please adjust! ###
-    pass
-    # ### end Alembic commands ###
+    op.drop_table("no_cash_request")
+    op.drop_table("cash_requests")
+    op.drop_table("counterparties")
+    op.drop_table("users")
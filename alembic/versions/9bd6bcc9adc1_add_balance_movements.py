@@ -0,0 +1,67 @@
+"""Add balance movements ledger
+
+Revision ID: 9bd6bcc9adc1
+Revises: d1beeaa669f1
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "9bd6bcc9adc1"
+down_revision: Union[str, None] = "d1beeaa669f1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "balance_movements",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.BigInteger(), nullable=False),
+        sa.Column("cash_desk", sa.String(), nullable=False),
+        sa.Column("amount", sa.Integer(), nullable=False),
+        sa.Column("reason", sa.String(), nullable=False),
+        sa.Column("cash_request_id", sa.Integer(), nullable=True),
+        sa.Column("no_cash_request_id", sa.Integer(), nullable=True),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("CURRENT_TIMESTAMP"),
+            nullable=False,
+        ),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.ForeignKeyConstraint(["cash_request_id"], ["cash_requests.id"]),
+        sa.ForeignKeyConstraint(
+            ["no_cash_request_id"], ["no_cash_request.id"]
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_balance_movements_id", "balance_movements", ["id"])
+    op.create_index(
+        "ix_balance_movements_user_id", "balance_movements", ["user_id"]
+    )
+    # Текущие балансы переносятся в журнал как начальные остатки.
+    for cash_desk, column in (
+        ("cash", "cash_balance"),
+        ("non_cash", "non_cash_balance"),
+    ):
+        op.execute(
+            "INSERT INTO balance_movements "
+            "(user_id, cash_desk, amount, reason) "
+            f"SELECT id, '{cash_desk}', {column}, 'opening' FROM users "
+            f"WHERE {column} IS NOT NULL AND {column} <> 0"
+        )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ix_balance_movements_user_id", table_name="balance_movements"
+    )
+    op.drop_index("ix_balance_movements_id", table_name="balance_movements")
+    op.drop_table("balance_movements")
@@ -0,0 +1,57 @@
+"""Add indexes for unpaid requests, counterparty name and foreign keys
+
+Revision ID: d1beeaa669f1
+Revises: 5ab86cdc725a
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d1beeaa669f1"
+down_revision: Union[str, None] = "5ab86cdc725a"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+REQUEST_TABLES = ("cash_requests", "no_cash_request")
+
+
+def upgrade() -> None:
+    # Индексы могли быть уже созданы ботом через create_all.
+    op.create_index(
+        "ix_counterparties_name",
+        "counterparties",
+        ["name"],
+        if_not_exists=True,
+    )
+    for table in REQUEST_TABLES:
+        op.create_index(
+            f"ix_{table}_user_id", table, ["user_id"], if_not_exists=True
+        )
+        op.create_index(
+            f"ix_{table}_counterparty_id",
+            table,
+            ["counterparty_id"],
+            if_not_exists=True,
+        )
+        op.create_index(
+            f"ix_{table}_unpaid",
+            table,
+            ["id"],
+            postgresql_where=sa.text("status IS false"),
+            sqlite_where=sa.text("status IS 0"),
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    for table in REQUEST_TABLES:
+        op.drop_index(f"ix_{table}_unpaid", table_name=table)
+        op.drop_index(f"ix_{table}_counterparty_id", table_name=table)
+        op.drop_index(f"ix_{table}_user_id", table_name=table)
+    op.drop_index("ix_counterparties_name", table_name="counterparties")
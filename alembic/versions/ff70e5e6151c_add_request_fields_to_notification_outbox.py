@@ -0,0 +1,35 @@
+"""Add request fields to notification outbox
+
+Revision ID: ff70e5e6151c
+Revises: 6f7a0ca2dc19
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "ff70e5e6151c"
+down_revision: Union[str, None] = "6f7a0ca2dc19"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "notification_outbox", sa.Column("amount", sa.Integer(), nullable=True)
+    )
+    op.add_column(
+        "notification_outbox",
+        sa.Column("counterparty_name", sa.String(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("notification_outbox") as batch_op:
+        batch_op.drop_column("counterparty_name")
+        batch_op.drop_column("amount")
@@ -0,0 +1,141 @@
+"""Сравнение построчных и пакетных операций CRUD.
+
+Запуск из корня репозитория:
+
+    python benchmarks/bench_bulk_crud.py --rows 5000
+
+По умолчанию используется временная база SQLite. Для Postgres передайте
+адрес отдельной пустой базы через --database-url: таблицы создаются
+перед замером и удаляются после него.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "my_cash_desk_bot"))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5_000)
+    parser.add_argument("--database-url")
+    return parser.parse_args()
+
+
+def counterparty_rows(rows: int, prefix: str) -> list:
+    return [
+        {
+            "name": f"{prefix} {i}",
+            "phone_or_card": str(i),
+            "bank": "Банк",
+            "is_individual": True,
+        }
+        for i in range(rows)
+    ]
+
+
+async def per_row(db, user_id: int, rows: int) -> dict:
+    """Построчный путь: по одному запросу и коммиту на запись."""
+
+    from models import crud
+
+    timings = {}
+    start = time.perf_counter()
+    counterparties = [
+        await crud.create_counterparty(db, **row)
+        for row in counterparty_rows(rows, "Построчно")
+    ]
+    timings["контрагенты"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    requests = []
+    for counterparty in counterparties:
+        requests.append(
+            await crud.create_cash_request(
+                db, user_id, counterparty.id, 1, "", False
+            )
+        )
+    timings["заявки"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for request in requests:
+        await crud.update_cash_request_status(
+            db, request.id, True, "bench", user_id
+        )
+    timings["оплата"] = time.perf_counter() - start
+    return timings
+
+
+async def bulk(db, user_id: int, rows: int) -> dict:
+    """Пакетный путь из models.crud."""
+
+    from models import crud
+    from models.data_base import CashRequest
+
+    timings = {}
+    start = time.perf_counter()
+    counterparties = await crud.bulk_upsert_counterparties(
+        db, counterparty_rows(rows, "Пакетно")
+    )
+    timings["контрагенты"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    request_ids = await crud.bulk_create_cash_requests(
+        db,
+        [
+            {
+                "user_id": user_id,
+                "counterparty_id": counterparty_id,
+                "amount": 1,
+                "comment": "",
+                "status": False,
+            }
+            for counterparty_id in counterparties.values()
+        ],
+    )
+    timings["заявки"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await crud.bulk_update_status(
+        db, CashRequest, request_ids, True, payer_id=user_id, document="bench"
+    )
+    timings["оплата"] = time.perf_counter() - start
+    return timings
+
+
+async def main(args):
+    from models import crud
+    from models.data_base import Base, SessionLocal, engine
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    try:
+        async with SessionLocal() as db:
+            user = await crud.create_user(db, "1", "bench")
+            row_timings = await per_row(db, user.id, args.rows)
+            bulk_timings = await bulk(db, user.id, args.rows)
+            # Обе серии оплат списываются с одной кассы.
+            balance = await crud.get_user_cash_balance(db, "1")
+    finally:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+        await engine.dispose()
+
+    print(f"Строк: {args.rows}, баланс после оплат: {balance}")
+    print(f"{'операция':<16}{'построчно, с':>16}{'пакетно, с':>16}")
+    for name, value in row_timings.items():
+        print(f"{name:<16}{value:>16.3f}{bulk_timings[name]:>16.3f}")
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.environ["DATABASE_URL"] = args.database_url or (
+            f"sqlite+aiosqlite:///{tmp_dir}/bench.db"
+        )
+        asyncio.run(main(args))
@@ -0,0 +1,299 @@
+"""Пропускная способность бота на синтетических апдейтах.
+
+Запуск из корня репозитория:
+
+    python benchmarks/bench_dispatcher.py --users 50
+
+Собирается настоящий диспетчер из cd_bot.create_dispatcher со всеми
+middleware и обработчиками, а запросы к Bot API перехватываются
+заглушкой сессии. Каждый сценарий (регистрация, создание наличной заявки,
+просмотр заявок, оплата с чеком) выполняют все пользователи одновременно,
+апдейты одного пользователя идут по очереди. По умолчанию используется
+временная база SQLite. Для Postgres передайте адрес отдельной пустой базы
+через --database-url: таблицы создаются перед замером и удаляются после
+него.
+"""
+
+import argparse
+import asyncio
+import itertools
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "my_cash_desk_bot"))
+
+TOKEN = "123456:" + "A" * 35
+PASSWORD = "bench"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument(
+        "--requests", type=int, default=2, help="заявок на пользователя"
+    )
+    parser.add_argument("--database-url")
+    return parser.parse_args()
+
+
+def make_stub_session():
+    from aiogram import methods, types
+    from aiogram.client.session.base import BaseSession
+
+    class StubSession(BaseSession):
+        """Отвечает на запросы к Bot API без сети."""
+
+        def __init__(self):
+            super().__init__()
+            self.requests = 0
+            self._message_ids = itertools.count(1)
+
+        async def make_request(self, bot, method, timeout=None):
+            self.requests += 1
+            if isinstance(method, methods.GetFile):
+                return types.File(
+                    file_id=method.file_id,
+                    file_unique_id=method.file_id,
+                    file_path=f"photos/{method.file_id}.jpg",
+                    file_size=1024,
+                )
+            if isinstance(
+                method, (methods.SendMessage, methods.EditMessageText)
+            ):
+                return types.Message(
+                    message_id=next(self._message_ids),
+                    date=datetime.now(),
+                    chat=types.Chat(id=method.chat_id or 0, type="private"),
+                    text=method.text,
+                ).as_(bot)
+            return True
+
+        async def stream_content(
+            self,
+            url,
+            headers=None,
+            timeout=30,
+            chunk_size=65536,
+            raise_for_status=True,
+        ):
+            yield b"\0" * 1024
+
+        async def close(self):
+            pass
+
+    return StubSession()
+
+
+class Updates:
+    """Синтетические апдейты от пользователей с telegram_id = user_id."""
+
+    def __init__(self):
+        self._ids = itertools.count(1)
+
+    def _user(self, user_id: int):
+        from aiogram import types
+
+        return types.User(
+            id=user_id,
+            is_bot=False,
+            first_name="Кассир",
+            username=f"bench{user_id}",
+        )
+
+    def _message(self, user_id: int, from_user, **fields):
+        from aiogram import types
+
+        return types.Message(
+            message_id=next(self._ids),
+            date=datetime.now(),
+            chat=types.Chat(id=user_id, type="private"),
+            from_user=from_user,
+            **fields,
+        )
+
+    def message(self, user_id: int, text: str = None, **fields):
+        from aiogram import types
+
+        return types.Update(
+            update_id=next(self._ids),
+            message=self._message(
+                user_id, self._user(user_id), text=text, **fields
+            ),
+        )
+
+    def photo(self, user_id: int):
+        from aiogram import types
+
+        file_id = f"check{next(self._ids)}"
+        return self.message(
+            user_id,
+            photo=[
+                types.PhotoSize(
+                    file_id=file_id,
+                    file_unique_id=file_id,
+                    width=1,
+                    height=1,
+                )
+            ],
+        )
+
+    def callback(self, user_id: int, data: str):
+        from aiogram import types
+
+        bot_user = types.User(id=1, is_bot=True, first_name="bot")
+        return types.Update(
+            update_id=next(self._ids),
+            callback_query=types.CallbackQuery(
+                id=str(next(self._ids)),
+                chat_instance="bench",
+                data=data,
+                message=self._message(user_id, bot_user, text="..."),
+                from_user=self._user(user_id),
+            ),
+        )
+
+
+def registration(updates: Updates, user_id: int, args) -> list:
+    return [
+        updates.message(user_id, "/start"),
+        updates.message(user_id, PASSWORD),
+        updates.message(user_id, "100000"),
+        updates.message(user_id, "100000"),
+    ]
+
+
+def create_requests(updates: Updates, user_id: int, args) -> list:
+    result = []
+    for number in range(args.requests):
+        result += [
+            updates.message(user_id, "Создать заявку"),
+            updates.message(user_id, "Наличная заявка"),
+            updates.message(user_id, f"ООО Бенч {user_id}-{number}"),
+            updates.message(user_id, "100"),
+            updates.message(user_id, "+79990000000"),
+            updates.message(user_id, "Банк"),
+            updates.message(user_id, "Оплата по счету"),
+            updates.callback(user_id, "confirm_yes"),
+        ]
+    return result
+
+
+def list_requests(updates: Updates, user_id: int, args) -> list:
+    return [
+        updates.message(user_id, "Посмотреть текущие не оплаченные заявки"),
+        updates.message(user_id, "Наличные заявки"),
+        updates.callback(user_id, "cash_page_1"),
+        updates.message(user_id, "/cancel"),
+    ]
+
+
+def pay_requests(updates: Updates, user_id: int, args) -> list:
+    # Кассиры оплачивают непересекающиеся диапазоны номеров заявок, чтобы
+    # не мешать друг другу.
+    first_id = (user_id - 1) * args.requests + 1
+    result = []
+    for request_id in range(first_id, first_id + args.requests):
+        result += [
+            updates.callback(user_id, f"pay_cash_{request_id}"),
+            updates.photo(user_id),
+        ]
+    return result
+
+
+SCENARIOS = (
+    ("регистрация", registration),
+    ("создание заявки", create_requests),
+    ("просмотр заявок", list_requests),
+    ("оплата с чеком", pay_requests),
+)
+
+
+async def run_user(dp, bot, updates: list, timings: list):
+    for update in updates:
+        start = time.perf_counter()
+        await dp.feed_update(bot, update)
+        timings.append(time.perf_counter() - start)
+
+
+async def main(args):
+    from aiogram import Bot
+    from cd_bot import create_dispatcher
+    from handlers.downloads import create_storage_dirs
+    from models.data_base import Base, CashRequest, SessionLocal, engine
+    from sqlalchemy import func, select
+
+    # Журнал каждого апдейта не выводится, медленные запросы - выводятся.
+    logging.getLogger().setLevel(logging.WARNING)
+
+    session = make_stub_session()
+    bot = Bot(token=TOKEN, session=session)
+    dp = create_dispatcher(bot)
+    updates = Updates()
+    user_ids = range(1, args.users + 1)
+
+    create_storage_dirs()
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    results = []
+    try:
+        for name, scenario in SCENARIOS:
+            timings = []
+            requests_before = session.requests
+            start = time.perf_counter()
+            await asyncio.gather(
+                *(
+                    run_user(
+                        dp, bot, scenario(updates, user_id, args), timings
+                    )
+                    for user_id in user_ids
+                )
+            )
+            elapsed = time.perf_counter() - start
+            results.append(
+                (name, timings, elapsed, session.requests - requests_before)
+            )
+        async with SessionLocal() as db:
+            paid = await db.scalar(
+                select(func.count()).where(CashRequest.status.is_(True))
+            )
+    finally:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+        await engine.dispose()
+
+    print(
+        f"Пользователей: {args.users}, заявок на пользователя: "
+        f"{args.requests}, оплачено: {paid}"
+    )
+    print(
+        f"{'сценарий':<18}{'апдейтов':>10}{'апд./с':>10}"
+        f"{'p50, мс':>10}{'p99, мс':>10}{'запросов API':>14}"
+    )
+    for name, timings, elapsed, api_requests in results:
+        timings.sort()
+        p50 = statistics.median(timings) * 1000
+        p99 = timings[max(int(len(timings) * 0.99) - 1, 0)] * 1000
+        print(
+            f"{name:<18}{len(timings):>10}{len(timings) / elapsed:>10.0f}"
+            f"{p50:>10.1f}{p99:>10.1f}{api_requests:>14}"
+        )
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.environ["DATABASE_URL"] = args.database_url or (
+            f"sqlite+aiosqlite:///{tmp_dir}/bench.db"
+        )
+        os.environ["API_TOKEN"] = TOKEN
+        os.environ["PASSWORD"] = PASSWORD
+        os.environ["METRICS_PORT"] = "0"
+        # Чеки сохраняются в ./checks относительно текущего каталога.
+        os.chdir(tmp_dir)
+        asyncio.run(main(args))
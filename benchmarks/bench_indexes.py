@@ -0,0 +1,171 @@
+"""Замер времени поиска по горячим путям с индексами и без них.
+
+Запуск из корня репозитория:
+
+    python benchmarks/bench_indexes.py --rows 100000
+
+По умолчанию используется временная база SQLite. Для Postgres передайте
+адрес отдельной пустой базы через --database-url: таблицы создаются
+перед замером и удаляются после него.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "my_cash_desk_bot"))
+
+BENCH_INDEXES = (
+    "ix_counterparties_name",
+    "ix_counterparties_normalized_name",
+    "ix_cash_requests_unpaid",
+    "ix_cash_requests_user_id",
+    "ix_cash_requests_counterparty_id",
+    "ix_no_cash_request_unpaid",
+    "ix_no_cash_request_user_id",
+    "ix_no_cash_request_counterparty_id",
+)
+BATCH_SIZE = 10_000
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument(
+        "--unpaid-share",
+        type=float,
+        default=0.02,
+        help="Доля неоплаченных заявок.",
+    )
+    parser.add_argument("--database-url")
+    return parser.parse_args()
+
+
+async def fill(engine, tables, rows: int, unpaid_share: float):
+    """Заполнить таблицы синтетическими данными."""
+
+    users = [
+        {"id": i, "telegram_id": str(i), "username": f"user{i}"}
+        for i in range(1, 11)
+    ]
+    async with engine.begin() as conn:
+        await conn.execute(tables["users"].insert(), users)
+        for start in range(1, rows + 1, BATCH_SIZE):
+            ids = range(start, min(start + BATCH_SIZE, rows + 1))
+            await conn.execute(
+                tables["counterparties"].insert(),
+                [
+                    {
+                        "id": i,
+                        "name": f"Контрагент {i}",
+                        "normalized_name": f"контрагент {i}",
+                        "phone_or_card": str(i),
+                        "bank": "Банк",
+                        "is_individual": True,
+                    }
+                    for i in ids
+                ],
+            )
+            for table in ("cash_requests", "no_cash_request"):
+                await conn.execute(
+                    tables[table].insert(),
+                    [
+                        {
+                            "id": i,
+                            "user_id": i % 10 + 1,
+                            "counterparty_id": i,
+                            "amount": i % 1000,
+                            "comment": "",
+                            "status": random.random() >= unpaid_share,
+                        }
+                        for i in ids
+                    ],
+                )
+
+
+async def measure(session_factory, rows: int, repeat: int) -> dict:
+    """Медианное время запросов горячих путей в миллисекундах."""
+
+    from handlers.ultils import PAGE_SIZE
+    from models import crud
+    from models.data_base import CashRequest
+    from sqlalchemy import func, select
+
+    cases = {
+        "get_counterparty": lambda db: crud.get_counterparty(
+            db, f"Контрагент {random.randint(1, rows)}"
+        ),
+        "unpaid cash page": lambda db: crud.get_unpaid_cash_requests_page(
+            db, PAGE_SIZE, after_id=random.randint(1, rows)
+        ),
+        "unpaid no cash page": (
+            lambda db: crud.get_unpaid_no_cash_requests_page(
+                db, PAGE_SIZE, after_id=random.randint(1, rows)
+            )
+        ),
+        "count unpaid cash": crud.count_unpaid_cash_requests,
+        "requests by counterparty": lambda db: db.scalar(
+            select(func.count())
+            .select_from(CashRequest)
+            .where(CashRequest.counterparty_id == random.randint(1, rows))
+        ),
+    }
+    results = {}
+    async with session_factory() as db:
+        for name, case in cases.items():
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                await case(db)
+                timings.append((time.perf_counter() - start) * 1000)
+            results[name] = statistics.median(timings)
+    return results
+
+
+async def main(args):
+    from models.data_base import Base, SessionLocal, engine
+    from sqlalchemy import text
+
+    indexes = {
+        index.name: index
+        for table in Base.metadata.sorted_tables
+        for index in table.indexes
+        if index.name in BENCH_INDEXES
+    }
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        for name in BENCH_INDEXES:
+            await conn.execute(text(f"DROP INDEX {name}"))
+    try:
+        print(f"Заполнение таблиц: {args.rows} строк...")
+        await fill(engine, Base.metadata.tables, args.rows, args.unpaid_share)
+        without_indexes = await measure(SessionLocal, args.rows, args.repeat)
+        async with engine.begin() as conn:
+            for name in BENCH_INDEXES:
+                await conn.run_sync(indexes[name].create)
+            await conn.execute(text("ANALYZE"))
+        with_indexes = await measure(SessionLocal, args.rows, args.repeat)
+    finally:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+        await engine.dispose()
+
+    print(f"{'запрос':<28}{'без индексов, мс':>18}{'с индексами, мс':>18}")
+    for name, value in without_indexes.items():
+        print(f"{name:<28}{value:>18.3f}{with_indexes[name]:>18.3f}")
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.environ["DATABASE_URL"] = args.database_url or (
+            f"sqlite+aiosqlite:///{tmp_dir}/bench.db"
+        )
+        asyncio.run(main(args))
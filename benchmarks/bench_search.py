@@ -0,0 +1,113 @@
+"""Замер времени нечеткого поиска контрагентов по имени.
+
+Запуск из корня репозитория:
+
+    python benchmarks/bench_search.py --rows 100000
+
+По умолчанию используется временная база SQLite и индекс в памяти. Для
+Postgres с pg_trgm передайте адрес отдельной пустой базы через
+--database-url: таблицы создаются перед замером и удаляются после него.
+Кэш результатов сбрасывается перед каждым запросом.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "my_cash_desk_bot"))
+
+FORMS = ("ООО", "ИП", "АО", "ЗАО")
+WORDS = (
+    "Ромашка",
+    "Василек",
+    "Стройсервис",
+    "Техномир",
+    "Альфа",
+    "Вектор",
+    "Гранит",
+    "Меридиан",
+    "Северный",
+    "Южный",
+    "Торговый",
+    "Дом",
+    "Логистик",
+    "Консалт",
+    "Энерго",
+    "Агро",
+)
+BATCH_SIZE = 10_000
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--database-url")
+    return parser.parse_args()
+
+
+def make_name(number: int) -> str:
+    words = random.sample(WORDS, 2)
+    return f"{random.choice(FORMS)} {words[0]} {words[1]} {number}"
+
+
+def make_query(name: str) -> str:
+    """Начало имени, иногда с опечаткой."""
+
+    query = name[: random.randint(3, len(name))]
+    if random.random() < 0.3 and len(query) > 4:
+        position = random.randrange(1, len(query))
+        query = query[:position] + "о" + query[position + 1 :]
+    return query
+
+
+async def main(args):
+    from models import search
+    from models.data_base import Base, SessionLocal, engine
+
+    names = [make_name(i) for i in range(1, args.rows + 1)]
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        table = Base.metadata.tables["counterparties"]
+        for start in range(0, args.rows, BATCH_SIZE):
+            await conn.execute(
+                table.insert(),
+                [{"name": name} for name in names[start : start + BATCH_SIZE]],
+            )
+    try:
+        async with SessionLocal() as db:
+            start = time.perf_counter()
+            await search.search_counterparties(db, "прогрев")
+            warmup = (time.perf_counter() - start) * 1000
+            timings = []
+            for _ in range(args.repeat):
+                query = make_query(random.choice(names))
+                search.search_cache = search.SearchCache()
+                start = time.perf_counter()
+                await search.search_counterparties(db, query)
+                timings.append((time.perf_counter() - start) * 1000)
+    finally:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+        await engine.dispose()
+
+    timings.sort()
+    print(f"Контрагентов: {args.rows}, первый запрос: {warmup:.1f} мс")
+    print(f"p50: {statistics.median(timings):.2f} мс")
+    print(f"p99: {timings[int(len(timings) * 0.99) - 1]:.2f} мс")
+    print(f"max: {timings[-1]:.2f} мс")
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.environ["DATABASE_URL"] = args.database_url or (
+            f"sqlite+aiosqlite:///{tmp_dir}/bench.db"
+        )
+        asyncio.run(main(args))
@@ -3,22 +3,35 @@ import logging
 
 from aiogram import Bot, Dispatcher, types
 from aiogram.fsm.storage.memory import MemoryStorage
-from config import BOT_TOKEN
+from config import BOT_TOKEN, METRICS_HOST, METRICS_PORT
 from handlers.callback import register_handlers_callback
 from handlers.create_requests import register_handlers_create_requests
+from handlers.downloads import create_storage_dirs
+from handlers.edit_requests import register_handlers_edit_request
+from handlers.export_data import register_handlers_export_data
+from handlers.import_data import register_handlers_import_data
+from handlers.inline_search import register_handlers_inline_search
+from handlers.metrics import (
+    HandlerMetricsMiddleware,
+    UpdateMetricsMiddleware,
+    register_fsm_metrics,
+    start_metrics_server,
+)
+from handlers.notifications import outbox_worker
+from handlers.outbound import ScheduledSession, outbound_scheduler
+from handlers.reports import register_handlers_reports
 from handlers.show_balance import reqister_handlers_show_balance
 from handlers.show_requests import register_handlers_show_requests
-from handlers.edit_requests import register_handlers_edit_request
-from handlers.start import DatabaseMiddleware, register_handlers_start
+from handlers.start import (
+    AuthMiddleware,
+    DatabaseMiddleware,
+    register_handlers_start,
+)
+from models.data_base import engine
+from models.schema import check_schema_version
 
 logging.basicConfig(level=logging.INFO)
 
-bot = Bot(token=BOT_TOKEN)
-dp = Dispatcher(storage=MemoryStorage())
-
-# Регистрация middleware для базы данных
-dp.update.middleware(DatabaseMiddleware())
-
 
 async def set_commands(bot: Bot):
 
@@ -32,23 +45,66 @@ async def set_commands(bot: Bot):
     await bot.set_my_commands(commands)
 
 
-# Регистрация обработчиков
-register_handlers_start(dp)
-register_handlers_create_requests(dp, bot)
-register_handlers_show_requests(dp)
-register_handlers_callback(dp)
-reqister_handlers_show_balance(dp)
-register_handlers_edit_request(dp)
+def create_dispatcher(bot: Bot) -> Dispatcher:
+    """Диспетчер со всеми middleware и обработчиками бота."""
+
+    dp = Dispatcher(storage=MemoryStorage())
+
+    # Метрики апдейтов считаются во внешнем middleware, метрики
+    # обработчиков - во внутреннем, который подключается раньше остальных.
+    dp.update.outer_middleware(UpdateMetricsMiddleware())
+    register_fsm_metrics(dp.storage)
+
+    # Регистрация middleware для базы данных и авторизации. Middleware
+    # подключаются к наблюдателям событий, а не к dp.update, чтобы видеть
+    # флаги обработчика. Авторизация идет после базы данных и использует ее
+    # сессию.
+    handler_metrics_middleware = HandlerMetricsMiddleware()
+    db_middleware = DatabaseMiddleware()
+    auth_middleware = AuthMiddleware()
+    for observer in (dp.message, dp.callback_query, dp.inline_query):
+        observer.middleware(handler_metrics_middleware)
+        observer.middleware(db_middleware)
+        observer.middleware(auth_middleware)
+
+    # Регистрация обработчиков
+    register_handlers_start(dp)
+    register_handlers_create_requests(dp, bot)
+    register_handlers_show_requests(dp)
+    register_handlers_callback(dp)
+    reqister_handlers_show_balance(dp)
+    register_handlers_edit_request(dp)
+    register_handlers_import_data(dp)
+    register_handlers_export_data(dp)
+    register_handlers_inline_search(dp)
+    register_handlers_reports(dp)
+    return dp
+
+
+bot = Bot(token=BOT_TOKEN, session=ScheduledSession(outbound_scheduler))
+dp = create_dispatcher(bot)
 
 
 async def on_startup(dp: Dispatcher):
+    create_storage_dirs()
+    await check_schema_version(engine)
     await set_commands(bot)
 
 
 async def main():
     # Запуск поллинга
     await on_startup(dp)
-    await dp.start_polling(bot)
+    metrics_runner = None
+    if METRICS_PORT:
+        metrics_runner = await start_metrics_server(METRICS_HOST, METRICS_PORT)
+    # Уведомления, не отправленные до перезапуска, уходят сразу после него.
+    outbox_task = asyncio.create_task(outbox_worker.run(bot))
+    try:
+        await dp.start_polling(bot)
+    finally:
+        outbox_task.cancel()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
 
 
 if __name__ == "__main__":
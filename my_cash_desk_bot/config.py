@@ -6,3 +6,55 @@ load_dotenv()
 
 
 BOT_TOKEN = os.getenv("API_TOKEN")
+
+# Через сколько минут неоплаченная заявка, взятая кассиром в оплату,
+# снова становится доступна другим кассирам.
+CLAIM_TIMEOUT_MINUTES = int(os.getenv("CLAIM_TIMEOUT_MINUTES", 15))
+
+# Telegram id администраторов через запятую. Администраторам доступен
+# импорт контрагентов и заявок из файла.
+ADMIN_IDS = {
+    int(admin_id)
+    for admin_id in os.getenv("ADMIN_IDS", "").split(",")
+    if admin_id.strip()
+}
+
+# Каталоги для чеков и счетов на оплату и наибольший размер скачиваемого
+# файла в байтах (Bot API отдает ботам файлы до 20 МБ).
+CHECKS_DIR = os.getenv("CHECKS_DIR", "./checks")
+INVOICES_DIR = os.getenv("INVOICES_DIR", "./invoices")
+MAX_DOWNLOAD_SIZE = int(os.getenv("MAX_DOWNLOAD_SIZE", 20 * 1024 * 1024))
+
+# Сколько строк файла импорта записывается в базу за одну транзакцию.
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", 1000))
+
+# Адрес HTTP-сервера с метриками Prometheus (/metrics). METRICS_PORT=0
+# отключает сервер.
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", 9100))
+
+# Лимиты исходящих сообщений: Telegram допускает около 30 сообщений в
+# секунду от бота и одно сообщение в секунду в один чат. В чат можно
+# отправить подряд до OUTBOUND_CHAT_BURST сообщений.
+OUTBOUND_RATE = float(os.getenv("OUTBOUND_RATE", 30))
+OUTBOUND_CHAT_INTERVAL = float(os.getenv("OUTBOUND_CHAT_INTERVAL", 1))
+OUTBOUND_CHAT_BURST = int(os.getenv("OUTBOUND_CHAT_BURST", 3))
+# Сколько запросов рассылки выполняется одновременно.
+BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", 10))
+# Сколько раз повторяется отправка после лимита или ошибки сети.
+BROADCAST_MAX_RETRIES = int(os.getenv("BROADCAST_MAX_RETRIES", 3))
+
+# Очередь уведомлений: сколько уведомлений отправляется за один проход,
+# как часто очередь проверяется без новых заявок (в секундах), первая
+# задержка повтора (удваивается с каждой попыткой, но не больше
+# OUTBOX_MAX_RETRY_DELAY) и число попыток.
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", 100))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", 5))
+OUTBOX_RETRY_DELAY = float(os.getenv("OUTBOX_RETRY_DELAY", 10))
+OUTBOX_MAX_RETRY_DELAY = float(os.getenv("OUTBOX_MAX_RETRY_DELAY", 3600))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", 8))
+
+# Сколько секунд уведомление о новой заявке ждет следующих. Уведомления,
+# накопленные у пользователя за это время, приходят одним сообщением.
+# 0 отключает сводные уведомления.
+NOTIFICATION_DIGEST_WINDOW = float(os.getenv("NOTIFICATION_DIGEST_WINDOW", 10))
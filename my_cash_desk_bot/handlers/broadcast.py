@@ -0,0 +1,55 @@
+import asyncio
+import logging
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramAPIError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+)
+from config import BROADCAST_CONCURRENCY, BROADCAST_MAX_RETRIES
+
+logger = logging.getLogger(__name__)
+
+
+class Broadcaster:
+    """Рассылка сообщений с повторами после сбоев.
+
+    Частоту отправки ограничивает планировщик исходящих сообщений в сессии
+    бота, здесь ограничено только число одновременных запросов. После
+    TelegramRetryAfter сообщение отправляется повторно по истечении
+    указанного Telegram времени.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = BROADCAST_CONCURRENCY,
+        max_retries: int = BROADCAST_MAX_RETRIES,
+    ):
+        self.max_retries = max_retries
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(self, bot: Bot, chat_id, text: str, **kwargs) -> bool:
+        """Отправить одно сообщение. Возвращает True, если оно доставлено."""
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self._semaphore:
+                    await bot.send_message(chat_id, text, **kwargs)
+                return True
+            except TelegramRetryAfter as error:
+                logger.warning("Лимит Telegram, пауза %s с", error.retry_after)
+                await asyncio.sleep(error.retry_after)
+            except TelegramNetworkError as error:
+                logger.warning(
+                    "Ошибка сети при отправке в %s: %s", chat_id, error
+                )
+                await asyncio.sleep(2**attempt)
+            except TelegramAPIError as error:
+                # Бот заблокирован, чат не найден и т.п.: повтор не поможет.
+                logger.info("Сообщение в %s не доставлено: %s", chat_id, error)
+                return False
+        return False
+
+
+broadcaster = Broadcaster()
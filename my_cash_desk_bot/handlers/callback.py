@@ -1,28 +1,58 @@
-import os
+from datetime import timedelta
 
 from aiogram import Dispatcher, F, types
 from aiogram.fsm.context import FSMContext
+from config import CHECKS_DIR, CLAIM_TIMEOUT_MINUTES
 from handlers.create_requests import RequestStates
+from handlers.downloads import FileTooLarge, max_download_size_text, save_file
 from handlers.show_requests import (
     show_unpaid_cash_requests_handler,
     show_unpaid_noncash_requests_handler,
 )
 from models.crud import (
+    claim_cash_request,
+    claim_no_cash_request,
     get_cash_request,
     get_no_cash_request,
     update_cash_request_status,
     update_no_cash_request_status,
 )
-from sqlalchemy.orm import Session
+from models.data_base import User
+from sqlalchemy.ext.asyncio import AsyncSession
+
+CLAIM_TIMEOUT = timedelta(minutes=CLAIM_TIMEOUT_MINUTES)
 
 
 async def pay_cash_request_handler(
-    callback_query: types.CallbackQuery, state: FSMContext, db: Session
+    callback_query: types.CallbackQuery,
+    state: FSMContext,
+    db: AsyncSession,
+    user: User,
 ):
     """Обработчик нажатия на кнопку 'Оплатить' для наличных заявок"""
 
-    request_id = int(callback_query.data.split("_")[-1])
-    request = get_cash_request(db, request_id)
+    # Заявка закрепляется за кассиром, пока он не пришлет чек. Если ее уже
+    # оплачивает другой кассир, выдается следующая свободная заявка.
+    request_id = await claim_cash_request(
+        db,
+        user.id,
+        CLAIM_TIMEOUT,
+        int(callback_query.data.split("_")[-1]),
+    )
+    if request_id is None:
+        request_id = await claim_cash_request(db, user.id, CLAIM_TIMEOUT)
+        if request_id is None:
+            await callback_query.message.answer(
+                "Эту заявку уже оплачивает другой кассир. "
+                "Свободных заявок нет."
+            )
+            await callback_query.answer()
+            return
+        await callback_query.message.answer(
+            "Эту заявку уже оплачивает другой кассир. "
+            "Вам передана следующая свободная заявка."
+        )
+    request = await get_cash_request(db, request_id)
 
     if request:
         await callback_query.message.answer(
@@ -39,12 +69,35 @@ async def pay_cash_request_handler(
 
 
 async def pay_noncash_request_handler(
-    callback_query: types.CallbackQuery, state: FSMContext, db: Session
+    callback_query: types.CallbackQuery,
+    state: FSMContext,
+    db: AsyncSession,
+    user: User,
 ):
     """Обработчик нажатия на кнопку 'Оплатить' для безналичных заявок"""
 
-    request_id = int(callback_query.data.split("_")[-1])
-    request = get_no_cash_request(db, request_id)
+    # Заявка закрепляется за кассиром, пока он не пришлет чек. Если ее уже
+    # оплачивает другой кассир, выдается следующая свободная заявка.
+    request_id = await claim_no_cash_request(
+        db,
+        user.id,
+        CLAIM_TIMEOUT,
+        int(callback_query.data.split("_")[-1]),
+    )
+    if request_id is None:
+        request_id = await claim_no_cash_request(db, user.id, CLAIM_TIMEOUT)
+        if request_id is None:
+            await callback_query.message.answer(
+                "Эту заявку уже оплачивает другой кассир. "
+                "Свободных заявок нет."
+            )
+            await callback_query.answer()
+            return
+        await callback_query.message.answer(
+            "Эту заявку уже оплачивает другой кассир. "
+            "Вам передана следующая свободная заявка."
+        )
+    request = await get_no_cash_request(db, request_id)
 
     if request:
         await callback_query.message.answer(
@@ -68,7 +121,7 @@ async def pay_noncash_request_handler(
 
 
 async def get_check_handler(
-    message: types.Message, state: FSMContext, db: Session
+    message: types.Message, state: FSMContext, db: AsyncSession, user: User
 ):
     """Обработчик получения чека или платежного поручения"""
 
@@ -79,48 +132,69 @@ async def get_check_handler(
     if message.photo or message.document:
         # Сохраняем чек и обновляем статус заявки
         if message.photo:
-            file_id = message.photo[-1].file_id
-            file_info = await message.bot.get_file(file_id)
-            file_path = file_info.file_path
-            file_name = f"./checks/{file_id}.jpg"
+            file = message.photo[-1]
+            file_name = f"{file.file_id}.jpg"
         else:
-            file_id = message.document.file_id
-            file_info = await message.bot.get_file(file_id)
-            file_path = file_info.file_path
-            file_name = f"./checks/{message.document.file_name}"
-
-        if not os.path.exists("./checks"):
-            os.makedirs("./checks")
-
-        await message.bot.download_file(file_path, file_name)
+            file = message.document
+            file_name = message.document.file_name
+        file_id = file.file_id
+
+        try:
+            await save_file(message.bot, file, CHECKS_DIR, file_name)
+        except FileTooLarge:
+            await message.answer(
+                "Файл слишком большой, максимальный размер - "
+                f"{max_download_size_text()}. Отправьте фото чека или "
+                "документ меньшего размера."
+            )
+            return
 
+        # Сумма заявки списывается с кассы оплатившего пользователя.
         if request_type == "cash":
-            update_cash_request_status(db, request_id, True, file_id)
+            request = await update_cash_request_status(
+                db, request_id, True, file_id, user.id
+            )
         else:
-            update_no_cash_request_status(db, request_id, True, file_id)
-        await message.answer(
-            "Чек/платежное поручение получено. Заявка успешно оплачена."
-        )
+            request = await update_no_cash_request_status(
+                db, request_id, True, file_id, user.id
+            )
+        if request:
+            await message.answer(
+                "Чек/платежное поручение получено. Заявка успешно оплачена."
+            )
+        else:
+            await message.answer(
+                "Заявка уже оплачена или ее оплачивает другой кассир."
+            )
         await state.clear()
     else:
         await message.answer("Пожалуйста, отправьте фото чека или документ.")
 
 
 async def pagination_callback_handler(
-    callback_query: types.CallbackQuery, state: FSMContext, db: Session
+    callback_query: types.CallbackQuery, state: FSMContext, db: AsyncSession
 ):
     """Обработчик коллбэков для пагинации"""
 
-    data = callback_query.data
-    if data.startswith("cash_page_"):
-        page = int(data.split("_")[2])
+    prefix, _, page, *cursor = callback_query.data.split("_")
+    page = int(page)
+    after_id = before_id = None
+    if cursor and cursor[0][1:].isdigit():
+        if cursor[0].startswith("a"):
+            after_id = int(cursor[0][1:])
+        else:
+            before_id = int(cursor[0][1:])
+    else:
+        # Кнопки без id заявки открывают первую страницу.
+        page = 0
+
+    if prefix == "cash":
         await show_unpaid_cash_requests_handler(
-            callback_query.message, state, db, page
+            callback_query.message, state, db, page, after_id, before_id
         )
-    elif data.startswith("noncash_page_"):
-        page = int(data.split("_")[2])
+    elif prefix == "noncash":
         await show_unpaid_noncash_requests_handler(
-            callback_query.message, state, db, page
+            callback_query.message, state, db, page, after_id, before_id
         )
     await callback_query.answer()
 
@@ -1,17 +1,13 @@
-import os
-
 from aiogram import Bot, Dispatcher, F, types
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from handlers.ultils import create_change_requests_buttons, notify_all_users
-from models.crud import (
-    create_cash_request,
-    create_counterparty,
-    create_no_cash_request,
-    get_counterparty,
-    get_user,
-)
-from sqlalchemy.orm import Session
+from config import INVOICES_DIR
+from handlers.downloads import FileTooLarge, max_download_size_text, save_file
+from handlers.notifications import outbox_worker
+from handlers.ultils import create_change_requests_buttons
+from models.crud import create_request_with_counterparty, get_counterparty
+from models.data_base import CashRequest, NoCashRequest, User
+from sqlalchemy.ext.asyncio import AsyncSession
 
 MIME_TYPES = [
     "application/pdf",
@@ -56,7 +52,18 @@ async def choose_request_type_handler(
 
     if message.text in ["Наличная заявка", "Безналичная заявка"]:
         await state.update_data(request_type=message.text)
-        await message.answer("Введите имя контрагента:")
+        # Кнопка открывает инлайн-поиск по именам уже известных контрагентов.
+        keyboard = types.InlineKeyboardMarkup(
+            inline_keyboard=[
+                [
+                    types.InlineKeyboardButton(
+                        text="Найти контрагента",
+                        switch_inline_query_current_chat="",
+                    )
+                ]
+            ]
+        )
+        await message.answer("Введите имя контрагента:", reply_markup=keyboard)
         await state.set_state(RequestStates.entering_contractor_name)
     else:
         await message.answer(
@@ -65,7 +72,7 @@ async def choose_request_type_handler(
 
 
 async def get_contractor_name_handler(
-    message: types.Message, state: FSMContext, db: Session
+    message: types.Message, state: FSMContext, db: AsyncSession
 ):
     """Проверка контрагента в базе данных."""
 
@@ -73,7 +80,7 @@ async def get_contractor_name_handler(
     await state.update_data(contractor_name=contractor_name)
 
     # Проверка наличия контрагента в базе данных
-    contractor = get_counterparty(db, contractor_name)
+    contractor = await get_counterparty(db, contractor_name)
 
     if contractor:
         # Контрагент найден, сохраняем его данные
@@ -95,7 +102,12 @@ async def get_contractor_name_handler(
 async def get_amount_to_pay(message: types.Message, state: FSMContext):
     """Сумма к оплате."""
 
-    await state.update_data(amount=message.text)
+    try:
+        amount = int(message.text)
+    except (TypeError, ValueError):
+        await message.answer("Пожалуйста, введите сумму целым числом:")
+        return
+    await state.update_data(amount=amount)
     data = await state.get_data()
     if data.get("request_type") == "Наличная заявка":
         if data.get("contractor_id") is None:
@@ -148,15 +160,17 @@ async def get_invoice_handler(message: types.Message, state: FSMContext):
 
     if message.content_type == types.ContentType.DOCUMENT:
         if message.document.mime_type in MIME_TYPES:
-            file_info = await message.bot.get_file(message.document.file_id)
-            file_path = file_info.file_path
-            file_name = os.path.basename(file_path)
-            if not os.path.exists("./invoices"):
-                os.makedirs("./invoices")
-            await message.bot.download_file(
-                file_path, f"./invoices/{file_name}"
-            )
-            await state.update_data(invoice_path=f"./invoices/{file_name}")
+            try:
+                invoice = await save_file(
+                    message.bot, message.document, INVOICES_DIR
+                )
+            except FileTooLarge:
+                await message.answer(
+                    "Файл слишком большой, максимальный размер - "
+                    f"{max_download_size_text()}."
+                )
+                return
+            await state.update_data(invoice_path=invoice.path)
             await show_summary(message, state)
         else:
             await message.answer(
@@ -211,79 +225,62 @@ async def show_summary(message: types.Message, state: FSMContext):
 async def confirm_request_handler(
     callback_query: types.CallbackQuery,
     state: FSMContext,
-    db: Session,
-    bot: Bot,
+    db: AsyncSession,
+    user: User,
 ):
     """Подтверждение заявки."""
 
     data = await state.get_data()
-    user = get_user(db, str(callback_query.from_user.id))
-    if not user:
-        await callback_query.message.answer("Пользователь не найден.")
-        await callback_query.answer()
-        return
-
     if callback_query.data == "confirm_yes":
-        # Проверка наличия контрагента в базе данных
-        contractor = get_counterparty(db, data["contractor_name"])
-        if not contractor:
-            # Создание нового контрагента
-            if data.get("request_type") == "Безналичная заявка":
-                contractor = create_counterparty(
-                    db,
-                    name=data["contractor_name"],
-                    phone_or_card=None,
-                    bank=None,
-                    is_individual=True,
-                )
-            else:
-                contractor = create_counterparty(
-                    db,
-                    name=data["contractor_name"],
-                    phone_or_card=data["phone_or_card"],
-                    bank=data["bank_name"],
-                    is_individual=True,
-                )
-            db.add(contractor)
-            db.commit()
+        summary = (
+            f"Имя контрагента: {data['contractor_name']}\n"
+            f"Комментарий: {data['comment']}\n"
+            f"Сумма: {data.get('amount', 'Не указано')}\n"
+        )
+        if data.get("request_type") == "Безналичная заявка":
+            summary += f"\nСчет: {data.get('invoice_path', 'Не загружен')}"
+        else:
+            summary += (
+                f"Телефон/Карта: {data.get('phone_or_card', 'Не указано')}\n"
+                f"Банк: {data.get('bank_name', 'Не указано')}\n"
+            )
+        # Контрагент (если он новый), заявка и уведомления остальным
+        # пользователям создаются одной транзакцией. Уведомления рассылает
+        # фоновый обработчик очереди.
+        notification = f"Новая заявка создана:\n\n{summary}"
         if data.get("request_type") == "Безналичная заявка":
-            request = create_no_cash_request(
+            request_id = await create_request_with_counterparty(
                 db,
+                NoCashRequest,
                 user_id=user.id,
-                counterparty_id=contractor.id,
+                counterparty_name=data["contractor_name"],
+                phone_or_card=None,
+                bank=None,
+                is_individual=True,
+                notification=notification,
                 amount=data["amount"],
                 invoice_path=data["invoice_path"],
                 comment=data["comment"],
                 status=False,
             )
         else:
-            request = create_cash_request(
+            request_id = await create_request_with_counterparty(
                 db,
+                CashRequest,
                 user_id=user.id,
-                counterparty_id=contractor.id,
+                counterparty_name=data["contractor_name"],
+                phone_or_card=data["phone_or_card"],
+                bank=data["bank_name"],
+                is_individual=True,
+                notification=notification,
                 amount=data["amount"],
                 comment=data["comment"],
                 status=False,
             )
-        db.add(request)
-        db.commit()
-        await state.update_data(request_id=request.id)
-        summary = (
-            f"Имя контрагента: {data['contractor_name']}\n"
-            f"Комментарий: {data['comment']}\n"
-            f"Сумма: {data.get('amount', 'Не указано')}\n"
-        )
-        if data.get("request_type") == "Безналичная заявка":
-            summary += f"\nСчет: {data.get('invoice_path', 'Не загружен')}"
-        else:
-            summary += (
-                f"Телефон/Карта: {data.get('phone_or_card', 'Не указано')}\n"
-                f"Банк: {data.get('bank_name', 'Не указано')}\n"
-            )
+        outbox_worker.wake()
+        await state.update_data(request_id=request_id)
         await callback_query.message.answer(f"Заявка отправлена:\n\n{summary}")
         await state.clear()
-        notification_message = f"Новая заявка создана:\n\n{summary}"
-        await notify_all_users(bot, db, notification_message)
     elif callback_query.data == "confirm_edit":
         keyboard = create_change_requests_buttons(0, data["request_type"])
         await callback_query.message.answer(
@@ -298,22 +295,42 @@ async def confirm_request_handler(
 
 
 def register_handlers_create_requests(dp: Dispatcher, bot: Bot):
-    dp.message.register(create_request_handler, F.text == "Создать заявку")
     dp.message.register(
-        choose_request_type_handler, RequestStates.choosing_request_type
+        create_request_handler,
+        F.text == "Создать заявку",
+        flags={"db": False},
+    )
+    dp.message.register(
+        choose_request_type_handler,
+        RequestStates.choosing_request_type,
+        flags={"db": False},
     )
     dp.message.register(
         get_contractor_name_handler, RequestStates.entering_contractor_name
     )
-    dp.message.register(get_amount_to_pay, RequestStates.entering_amount)
     dp.message.register(
-        get_phone_or_card_handler, RequestStates.entering_phone_or_card
+        get_amount_to_pay, RequestStates.entering_amount, flags={"db": False}
+    )
+    dp.message.register(
+        get_phone_or_card_handler,
+        RequestStates.entering_phone_or_card,
+        flags={"db": False},
+    )
+    dp.message.register(
+        get_bank_name_handler,
+        RequestStates.entering_bank_name,
+        flags={"db": False},
+    )
+    dp.message.register(
+        get_comment_handler,
+        RequestStates.entering_comment,
+        flags={"db": False},
     )
     dp.message.register(
-        get_bank_name_handler, RequestStates.entering_bank_name
+        get_invoice_handler,
+        RequestStates.uploading_invoice,
+        flags={"db": False},
     )
-    dp.message.register(get_comment_handler, RequestStates.entering_comment)
-    dp.message.register(get_invoice_handler, RequestStates.uploading_invoice)
     dp.callback_query.register(
         confirm_request_handler, RequestStates.awaiting_confirmation
     )
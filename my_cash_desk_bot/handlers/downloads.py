@@ -0,0 +1,92 @@
+import hashlib
+import logging
+import os
+import secrets
+from contextlib import aclosing, suppress
+from typing import NamedTuple
+
+import aiofiles
+import aiofiles.os
+from aiogram import Bot
+from config import CHECKS_DIR, INVOICES_DIR, MAX_DOWNLOAD_SIZE
+
+logger = logging.getLogger(__name__)
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+# Общее время на скачивание одного файла в секундах.
+DOWNLOAD_TIMEOUT = 120
+
+
+class FileTooLarge(Exception):
+    """Файл больше допустимого размера."""
+
+
+class SavedFile(NamedTuple):
+    path: str
+    size: int
+    sha256: str
+
+
+def create_storage_dirs():
+    """Создать каталоги для чеков и счетов. Вызывается при запуске бота."""
+    for directory in (CHECKS_DIR, INVOICES_DIR):
+        os.makedirs(directory, exist_ok=True)
+
+
+def max_download_size_text(max_size: int = MAX_DOWNLOAD_SIZE) -> str:
+    return f"{max_size / (1024 * 1024):g} МБ"
+
+
+async def save_file(
+    bot: Bot,
+    file,
+    directory: str,
+    file_name: str = None,
+    max_size: int = MAX_DOWNLOAD_SIZE,
+) -> SavedFile:
+    """Скачать файл из Telegram в directory.
+
+    file - PhotoSize, Document и т.п. Файл пишется по частям во временный
+    файл рядом с итоговым и переименовывается после полной загрузки, так
+    что недокачанный файл под итоговым именем не появится. Если файл
+    больше max_size, выбрасывается FileTooLarge.
+    """
+    if file.file_size and file.file_size > max_size:
+        raise FileTooLarge(file.file_size)
+    file_info = await bot.get_file(file.file_id)
+    # Имя документа задает пользователь, каталоги из него отбрасываются.
+    name = os.path.basename(file_name or file_info.file_path)
+    path = os.path.join(directory, name)
+    temp_path = os.path.join(directory, f".{secrets.token_hex(8)}.part")
+
+    url = bot.session.api.file_url(bot.token, file_info.file_path)
+    stream = bot.session.stream_content(
+        url=url,
+        timeout=DOWNLOAD_TIMEOUT,
+        chunk_size=DOWNLOAD_CHUNK_SIZE,
+        raise_for_status=True,
+    )
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(temp_path, "wb") as output, aclosing(stream):
+            async for chunk in stream:
+                size += len(chunk)
+                if size > max_size:
+                    raise FileTooLarge(size)
+                digest.update(chunk)
+                await output.write(chunk)
+        await aiofiles.os.replace(temp_path, path)
+    except BaseException:
+        with suppress(FileNotFoundError):
+            await aiofiles.os.remove(temp_path)
+        raise
+
+    saved = SavedFile(path, size, digest.hexdigest())
+    logger.info(
+        "Сохранен файл %s, %s байт, sha256 %s",
+        saved.path,
+        saved.size,
+        saved.sha256,
+    )
+    return saved
@@ -1,4 +1,4 @@
-from aiogram import types, Dispatcher
+from aiogram import Dispatcher, types
 from aiogram.fsm.context import FSMContext
 from handlers.create_requests import RequestStates, show_summary
 
@@ -48,7 +48,12 @@ async def process_contractor_name(message: types.Message, state: FSMContext):
 async def process_amount(message: types.Message, state: FSMContext):
     """Обработка новой суммы."""
 
-    await state.update_data(amount=message.text)
+    try:
+        amount = int(message.text)
+    except (TypeError, ValueError):
+        await message.answer("Пожалуйста, введите сумму целым числом:")
+        return
+    await state.update_data(amount=amount)
     await message.answer("Сумма обновлена.")
     await show_summary(message, state)
     await state.set_state(RequestStates.awaiting_confirmation)
@@ -83,14 +88,28 @@ async def process_comment(message: types.Message, state: FSMContext):
 
 def register_handlers_edit_request(dp: Dispatcher):
     dp.callback_query.register(
-        edit_request_handler, RequestStates.editing_request
+        edit_request_handler,
+        RequestStates.editing_request,
+        flags={"db": False},
     )
     dp.message.register(
-        process_contractor_name, RequestStates.entering_contractor_name
+        process_contractor_name,
+        RequestStates.entering_contractor_name,
+        flags={"db": False},
     )
-    dp.message.register(process_amount, RequestStates.entering_amount)
     dp.message.register(
-        process_phone_or_card, RequestStates.entering_phone_or_card
+        process_amount, RequestStates.entering_amount, flags={"db": False}
+    )
+    dp.message.register(
+        process_phone_or_card,
+        RequestStates.entering_phone_or_card,
+        flags={"db": False},
+    )
+    dp.message.register(
+        process_bank_name,
+        RequestStates.entering_bank_name,
+        flags={"db": False},
+    )
+    dp.message.register(
+        process_comment, RequestStates.entering_comment, flags={"db": False}
     )
-    dp.message.register(process_bank_name, RequestStates.entering_bank_name)
-    dp.message.register(process_comment, RequestStates.entering_comment)
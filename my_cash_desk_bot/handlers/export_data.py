@@ -0,0 +1,164 @@
+import asyncio
+import csv
+import io
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+import aiofiles
+from aiogram import Dispatcher, types
+from aiogram.filters import Command, CommandObject
+from config import ADMIN_IDS
+from models.crud import stream_request_history
+from models.data_base import CashRequest, NoCashRequest
+from openpyxl import Workbook
+from sqlalchemy.ext.asyncio import AsyncSession
+
+EXPORT_COLUMNS = (
+    "Тип",
+    "Номер",
+    "Создана",
+    "Автор",
+    "Telegram id автора",
+    "Контрагент",
+    "Телефон/Карта",
+    "Банк",
+    "Сумма",
+    "Комментарий",
+    "Статус",
+)
+EXPORT_REQUEST_TYPES = (
+    ("Наличная", CashRequest),
+    ("Безналичная", NoCashRequest),
+)
+DATE_FORMAT = "%d.%m.%Y"
+# Размер буфера, после которого CSV дописывается в файл.
+CSV_BUFFER_SIZE = 64 * 1024
+
+
+async def export_rows(db: AsyncSession, date_from, date_to):
+    """Строки выгрузки по всем типам заявок."""
+
+    for request_type, model in EXPORT_REQUEST_TYPES:
+        async for row in stream_request_history(db, model, date_from, date_to):
+            (
+                request_id,
+                created_at,
+                username,
+                telegram_id,
+                name,
+                phone_or_card,
+                bank,
+                amount,
+                comment,
+                status,
+            ) = row
+            yield (
+                request_type,
+                request_id,
+                created_at.strftime("%d.%m.%Y %H:%M") if created_at else "",
+                username,
+                telegram_id,
+                name,
+                phone_or_card,
+                bank,
+                amount,
+                comment,
+                "Оплачена" if status else "Не оплачена",
+            )
+
+
+async def write_csv(path: str, rows) -> int:
+    """Записать строки в CSV по мере чтения. Возвращает число строк."""
+
+    count = 0
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=";")
+    writer.writerow(EXPORT_COLUMNS)
+    async with aiofiles.open(path, "w", encoding="utf-8-sig") as file:
+        async for row in rows:
+            writer.writerow(row)
+            count += 1
+            if buffer.tell() >= CSV_BUFFER_SIZE:
+                await file.write(buffer.getvalue())
+                buffer.seek(0)
+                buffer.truncate()
+        await file.write(buffer.getvalue())
+    return count
+
+
+async def write_xlsx(path: str, rows) -> int:
+    """Записать строки в книгу Excel в потоковом режиме openpyxl."""
+
+    count = 0
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Заявки")
+    sheet.append(EXPORT_COLUMNS)
+    async for row in rows:
+        sheet.append(row)
+        count += 1
+    await asyncio.to_thread(workbook.save, path)
+    return count
+
+
+WRITERS = {"csv": write_csv, "xlsx": write_xlsx}
+
+
+def parse_export_args(args: str):
+    """Разобрать аргументы /export: [csv|xlsx] [начало] [конец].
+
+    Даты в формате ДД.ММ.ГГГГ считаются в UTC, дата окончания включается
+    в период. Без дат выгружается вся история.
+    """
+
+    file_format = "csv"
+    dates = []
+    for arg in (args or "").split():
+        if arg.lower() in WRITERS:
+            file_format = arg.lower()
+        else:
+            dates.append(
+                datetime.strptime(arg, DATE_FORMAT).replace(
+                    tzinfo=timezone.utc
+                )
+            )
+    if len(dates) > 2:
+        raise ValueError("слишком много дат")
+    date_from = dates[0] if dates else None
+    date_to = dates[1] + timedelta(days=1) if len(dates) == 2 else None
+    return file_format, date_from, date_to
+
+
+async def export_handler(
+    message: types.Message, command: CommandObject, db: AsyncSession
+):
+    """Выгрузить историю заявок в файл."""
+
+    if message.from_user.id not in ADMIN_IDS:
+        await message.answer("Выгрузка доступна только администраторам.")
+        return
+    try:
+        file_format, date_from, date_to = parse_export_args(command.args)
+    except ValueError:
+        await message.answer(
+            "Формат команды: /export [csv|xlsx] [ДД.ММ.ГГГГ] [ДД.ММ.ГГГГ]"
+        )
+        return
+
+    await message.answer("Готовлю выгрузку...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_name = f"requests.{file_format}"
+        path = os.path.join(tmp_dir, file_name)
+        count = await WRITERS[file_format](
+            path, export_rows(db, date_from, date_to)
+        )
+        # Соединение не нужно на время отправки файла.
+        await db.close()
+        await message.answer_document(
+            types.FSInputFile(path, filename=file_name),
+            caption=f"Выгружено заявок: {count}",
+        )
+
+
+def register_handlers_export_data(dp: Dispatcher):
+    dp.message.register(export_handler, Command("export"))
@@ -0,0 +1,289 @@
+import asyncio
+import csv
+import logging
+import os
+import tempfile
+import time
+
+from aiogram import Dispatcher, F, types
+from aiogram.filters import Command
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State, StatesGroup
+from config import ADMIN_IDS, IMPORT_BATCH_SIZE
+from handlers.create_requests import MIME_TYPES
+from models.crud import (
+    bulk_create_cash_requests,
+    bulk_create_no_cash_requests,
+    bulk_upsert_counterparties,
+)
+from models.data_base import User
+from models.deps import get_db
+from openpyxl import load_workbook
+
+# Счет в PDF для импорта не подходит, зато CSV часто приходит как text/*.
+IMPORT_MIME_TYPES = [
+    mime_type for mime_type in MIME_TYPES if mime_type != "application/pdf"
+] + ["text/csv", "text/comma-separated-values", "text/plain"]
+
+IMPORT_COLUMNS = (
+    "name",
+    "phone_or_card",
+    "bank",
+    "is_individual",
+    "request_type",
+    "amount",
+    "comment",
+)
+TRUE_VALUES = {"1", "true", "yes", "да", "+"}
+REQUEST_TYPES = {
+    "cash": "cash",
+    "наличная": "cash",
+    "non_cash": "non_cash",
+    "безналичная": "non_cash",
+}
+BULK_CREATE_REQUESTS = {
+    "cash": bulk_create_cash_requests,
+    "non_cash": bulk_create_no_cash_requests,
+}
+# Сколько ошибок валидации показывать в итоговом сообщении.
+MAX_REPORTED_ERRORS = 10
+# Не чаще одного редактирования сообщения о ходе импорта за интервал.
+PROGRESS_INTERVAL = 2
+
+
+class ImportStates(StatesGroup):
+    waiting_for_file = State()
+
+
+def read_csv(path: str):
+    """Построчно читать CSV с разделителем ',', ';' или табуляцией."""
+
+    with open(path, newline="", encoding="utf-8-sig") as file:
+        # Разделитель определяется по строке заголовков.
+        header = file.readline()
+        delimiter = max(",;\t", key=header.count)
+        file.seek(0)
+        yield from csv.reader(file, delimiter=delimiter)
+
+
+def read_xlsx(path: str):
+    """Построчно читать первый лист книги Excel, не загружая ее целиком."""
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+READERS = {".csv": read_csv, ".xlsx": read_xlsx}
+
+
+def _cell(record: dict, column: str) -> str:
+    value = record.get(column)
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return "" if value is None else str(value).strip()
+
+
+def parse_row(record: dict):
+    """Проверить строку файла.
+
+    Возвращает данные контрагента, тип заявки и поля заявки. Если сумма не
+    указана, заявка не создается и тип с полями равны None.
+    """
+
+    name = _cell(record, "name")
+    if not name:
+        raise ValueError("не указано имя контрагента")
+    # Пустая ячейка - None: сохраненные реквизиты контрагента не меняются.
+    is_individual = _cell(record, "is_individual").lower()
+    counterparty = {
+        "name": name,
+        "phone_or_card": _cell(record, "phone_or_card") or None,
+        "bank": _cell(record, "bank") or None,
+        "is_individual": (
+            is_individual in TRUE_VALUES if is_individual else None
+        ),
+    }
+
+    amount = _cell(record, "amount")
+    if not amount:
+        return counterparty, None, None
+    try:
+        amount = int(amount)
+    except ValueError:
+        raise ValueError("сумма должна быть целым числом")
+    request_type = REQUEST_TYPES.get(
+        _cell(record, "request_type").lower() or "cash"
+    )
+    if request_type is None:
+        raise ValueError("неизвестный тип заявки")
+    request = {
+        "amount": amount,
+        "comment": _cell(record, "comment"),
+        "status": False,
+    }
+    return counterparty, request_type, request
+
+
+async def insert_batch(user_id: int, counterparties: list, requests: list):
+    """Записать пакет контрагентов и заявок пользователя user_id.
+
+    Пакет записывается в одной транзакции.
+    """
+
+    async with get_db() as db:
+        ids = await bulk_upsert_counterparties(
+            db, counterparties, commit=False
+        )
+        for request_type, bulk_create in BULK_CREATE_REQUESTS.items():
+            rows = [
+                {**fields, "user_id": user_id, "counterparty_id": ids[name]}
+                for row_type, name, fields in requests
+                if row_type == request_type
+            ]
+            if rows:
+                await bulk_create(db, rows, commit=False)
+        await db.commit()
+
+
+def import_file(path, reader, user_id, loop, report_progress) -> dict:
+    """Импортировать файл. Выполняется в отдельном потоке.
+
+    Строки читаются и проверяются в потоке, а пакеты записываются в базу
+    в цикле событий бота через run_coroutine_threadsafe.
+    """
+
+    stats = {"rows": 0, "imported": 0, "requests": 0, "errors": 0}
+    # Сохраняются только первые ошибки, чтобы не держать их все в памяти.
+    stats["error_lines"] = []
+    rows = reader(path)
+    header = [str(value or "").strip().lower() for value in next(rows, ())]
+    if "name" not in header:
+        raise ValueError("в первой строке файла нет колонки name")
+
+    counterparties, requests = [], []
+
+    def flush():
+        if counterparties:
+            asyncio.run_coroutine_threadsafe(
+                insert_batch(user_id, counterparties, requests), loop
+            ).result()
+            stats["imported"] += len(counterparties)
+            stats["requests"] += len(requests)
+            counterparties.clear()
+            requests.clear()
+        report_progress(stats)
+
+    for line, values in enumerate(rows, start=2):
+        if not any(values):
+            continue
+        stats["rows"] += 1
+        try:
+            counterparty, request_type, request = parse_row(
+                dict(zip(header, values))
+            )
+        except ValueError as error:
+            stats["errors"] += 1
+            if len(stats["error_lines"]) < MAX_REPORTED_ERRORS:
+                stats["error_lines"].append(f"строка {line}: {error}")
+            continue
+        counterparties.append(counterparty)
+        if request_type:
+            requests.append((request_type, counterparty["name"], request))
+        if len(counterparties) >= IMPORT_BATCH_SIZE:
+            flush()
+    flush()
+    return stats
+
+
+def format_stats(stats: dict) -> str:
+    return (
+        f"Обработано строк: {stats['rows']}\n"
+        f"Импортировано контрагентов: {stats['imported']}\n"
+        f"Создано заявок: {stats['requests']}\n"
+        f"Ошибок: {stats['errors']}"
+    )
+
+
+async def import_command_handler(message: types.Message, state: FSMContext):
+    """Начать импорт контрагентов и заявок из файла."""
+
+    if message.from_user.id not in ADMIN_IDS:
+        await message.answer("Импорт доступен только администраторам.")
+        return
+    await message.answer(
+        "Загрузите файл CSV или Excel (.xlsx). В первой строке должны быть "
+        f"названия колонок: {', '.join(IMPORT_COLUMNS)}.\n"
+        "Обязательна только колонка name. Если указана сумма amount, "
+        "создается неоплаченная заявка с типом request_type "
+        "(наличная или безналичная)."
+    )
+    await state.set_state(ImportStates.waiting_for_file)
+
+
+async def import_file_handler(
+    message: types.Message, state: FSMContext, user: User
+):
+    """Загрузка файла импорта."""
+
+    document = message.document
+    extension = os.path.splitext(document.file_name or "")[1].lower()
+    if document.mime_type not in IMPORT_MIME_TYPES or (
+        extension not in READERS
+    ):
+        await message.answer(
+            "Пожалуйста, загрузите файл в формате CSV или Excel (.xlsx)."
+        )
+        return
+
+    await state.clear()
+
+    progress = await message.answer("Импорт начат...")
+    loop = asyncio.get_running_loop()
+    last_report = time.monotonic()
+
+    def report_progress(stats: dict):
+        nonlocal last_report
+        if time.monotonic() - last_report < PROGRESS_INTERVAL:
+            return
+        last_report = time.monotonic()
+        asyncio.run_coroutine_threadsafe(
+            progress.edit_text(f"Идет импорт...\n\n{format_stats(stats)}"),
+            loop,
+        )
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, f"import{extension}")
+        await message.bot.download(document, destination=path)
+        try:
+            stats = await asyncio.to_thread(
+                import_file,
+                path,
+                READERS[extension],
+                user.id,
+                loop,
+                report_progress,
+            )
+        except Exception as error:
+            logging.exception("Ошибка импорта файла %s", document.file_name)
+            await progress.edit_text(f"Импорт прерван: {error}")
+            return
+
+    text = f"Импорт завершен.\n\n{format_stats(stats)}"
+    if stats["errors"]:
+        text += "\n\n" + "\n".join(stats["error_lines"])
+    await progress.edit_text(text)
+
+
+def register_handlers_import_data(dp: Dispatcher):
+    dp.message.register(
+        import_command_handler, Command("import"), flags={"db": False}
+    )
+    dp.message.register(
+        import_file_handler,
+        ImportStates.waiting_for_file,
+        F.document,
+        flags={"db": False},
+    )
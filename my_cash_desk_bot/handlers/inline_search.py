@@ -0,0 +1,30 @@
+from aiogram import Dispatcher, types
+from models.search import SEARCH_CACHE_TTL, search_counterparties
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+async def counterparty_inline_handler(
+    inline_query: types.InlineQuery, db: AsyncSession
+):
+    """Подсказки имен контрагентов в инлайн-режиме."""
+
+    counterparties = await search_counterparties(db, inline_query.query)
+    results = [
+        types.InlineQueryResultArticle(
+            id=str(counterparty_id),
+            title=name,
+            input_message_content=types.InputTextMessageContent(
+                message_text=name
+            ),
+        )
+        for counterparty_id, name in counterparties
+    ]
+    # Подсказки доступны только зарегистрированным пользователям, поэтому
+    # Telegram не должен отдавать их из общего кэша.
+    await inline_query.answer(
+        results, cache_time=int(SEARCH_CACHE_TTL), is_personal=True
+    )
+
+
+def register_handlers_inline_search(dp: Dispatcher):
+    dp.inline_query.register(counterparty_inline_handler)
@@ -0,0 +1,149 @@
+import time
+from collections import Counter
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiohttp import web
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY
+from prometheus_client import Counter as CounterMetric
+from prometheus_client import Gauge, Histogram, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+UPDATE_SECONDS = Histogram(
+    "bot_update_seconds",
+    "Время обработки апдейта целиком.",
+    ["update_type"],
+    buckets=LATENCY_BUCKETS,
+)
+UPDATES_TOTAL = CounterMetric(
+    "bot_updates_total",
+    "Обработанные апдейты: handled, unhandled или error.",
+    ["update_type", "result"],
+)
+UPDATES_IN_PROGRESS = Gauge(
+    "bot_updates_in_progress", "Апдейты, которые обрабатываются сейчас."
+)
+UPDATES_BY_STATE = CounterMetric(
+    "bot_updates_by_state_total",
+    "Апдейты по состоянию FSM пользователя на момент получения.",
+    ["state"],
+)
+HANDLER_SECONDS = Histogram(
+    "bot_handler_seconds",
+    "Время работы обработчика вместе с его middleware.",
+    ["handler"],
+    buckets=LATENCY_BUCKETS,
+)
+HANDLER_ERRORS = CounterMetric(
+    "bot_handler_errors_total",
+    "Исключения в обработчиках.",
+    ["handler", "error"],
+)
+OUTBOUND_QUEUE_DEPTH = Gauge(
+    "bot_outbound_queue_depth",
+    "Сообщения, ожидающие отправки в общей очереди.",
+    ["priority"],
+)
+OUTBOUND_WAIT_SECONDS = Histogram(
+    "bot_outbound_wait_seconds",
+    "Время ожидания сообщения в очереди перед отправкой.",
+    ["priority"],
+    buckets=LATENCY_BUCKETS,
+)
+OUTBOUND_RETRY_AFTER = CounterMetric(
+    "bot_outbound_retry_after_total",
+    "Ответы Telegram о превышении лимита (RetryAfter).",
+)
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """Внешний middleware для dp.update: время и итог каждого апдейта."""
+
+    async def __call__(self, handler, event, data):
+        update_type = event.event_type
+        UPDATES_BY_STATE.labels(data.get("raw_state") or "none").inc()
+        start = time.perf_counter()
+        result = "error"
+        try:
+            with UPDATES_IN_PROGRESS.track_inprogress():
+                response = await handler(event, data)
+            result = "unhandled" if response is UNHANDLED else "handled"
+            return response
+        finally:
+            UPDATE_SECONDS.labels(update_type).observe(
+                time.perf_counter() - start
+            )
+            UPDATES_TOTAL.labels(update_type, result).inc()
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Внутренний middleware: время и ошибки выбранного обработчика.
+
+    Подключается к наблюдателям событий первым, чтобы учитывать время
+    остальных middleware.
+    """
+
+    async def __call__(self, handler, event, data):
+        callback = data["handler"].callback
+        name = f"{callback.__module__}.{callback.__name__}"
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception as error:
+            HANDLER_ERRORS.labels(name, type(error).__name__).inc()
+            raise
+        finally:
+            HANDLER_SECONDS.labels(name).observe(time.perf_counter() - start)
+
+
+class FSMStatesCollector:
+    """Число пользователей в каждом состоянии FSM на момент опроса."""
+
+    def __init__(self):
+        self.storage = None
+
+    def collect(self):
+        storage = self.storage
+        records = list(storage.storage.values()) if storage else []
+        states = Counter(record.state for record in records if record.state)
+        metric = GaugeMetricFamily(
+            "bot_fsm_states",
+            "Пользователи в состояниях FSM.",
+            labels=["state"],
+        )
+        for state, count in states.items():
+            metric.add_metric([state], count)
+        yield metric
+
+
+fsm_states_collector = FSMStatesCollector()
+REGISTRY.register(fsm_states_collector)
+
+
+def register_fsm_metrics(storage):
+    """Считать состояния FSM в хранилище последнего созданного диспетчера.
+
+    Состояния других хранилищ живут вне процесса и здесь не считаются.
+    """
+    if isinstance(storage, MemoryStorage):
+        fsm_states_collector.storage = storage
+
+
+async def metrics_handler(request: web.Request) -> web.Response:
+    return web.Response(
+        body=generate_latest(), headers={"Content-Type": CONTENT_TYPE_LATEST}
+    )
+
+
+async def start_metrics_server(host: str, port: int) -> web.AppRunner:
+    """Запустить HTTP-сервер с метриками Prometheus по адресу /metrics."""
+
+    app = web.Application()
+    app.router.add_get("/metrics", metrics_handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
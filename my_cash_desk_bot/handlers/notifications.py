@@ -0,0 +1,150 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+from aiogram import Bot
+from config import (
+    NOTIFICATION_DIGEST_WINDOW,
+    OUTBOX_BATCH_SIZE,
+    OUTBOX_MAX_ATTEMPTS,
+    OUTBOX_MAX_RETRY_DELAY,
+    OUTBOX_POLL_INTERVAL,
+    OUTBOX_RETRY_DELAY,
+)
+from handlers.broadcast import broadcaster
+from handlers.outbound import BACKGROUND, outbound_priority
+from models.crud import claim_notifications, finish_notifications
+from models.deps import get_db
+
+logger = logging.getLogger(__name__)
+
+# На сколько уведомление закрепляется за отправляющим процессом. Если
+# процесс упадет, уведомление отправится повторно по истечении этого
+# срока.
+OUTBOX_LEASE = timedelta(minutes=5)
+# Сколько контрагентов перечисляется в сводном уведомлении.
+DIGEST_MAX_COUNTERPARTIES = 20
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Задержка перед следующей попыткой после attempts неудачных."""
+    return timedelta(
+        seconds=min(
+            OUTBOX_RETRY_DELAY * 2 ** (attempts - 1), OUTBOX_MAX_RETRY_DELAY
+        )
+    )
+
+
+def digest_text(rows: list) -> str:
+    """Текст одного сообщения для всех уведомлений чата.
+
+    Одно уведомление отправляется как есть, несколько сводятся в одно
+    сообщение с числом заявок, общей суммой и списком контрагентов.
+    """
+    if len(rows) == 1:
+        return rows[0].text
+    total = sum(row.amount or 0 for row in rows)
+    names = list(
+        dict.fromkeys(
+            row.counterparty_name for row in rows if row.counterparty_name
+        )
+    )
+    lines = [f"Новых заявок: {len(rows)} на сумму {total} руб."]
+    if names:
+        lines += ["", "Контрагенты:", *names[:DIGEST_MAX_COUNTERPARTIES]]
+    if len(names) > DIGEST_MAX_COUNTERPARTIES:
+        lines.append(f"и еще {len(names) - DIGEST_MAX_COUNTERPARTIES}")
+    return "\n".join(lines)
+
+
+class OutboxWorker:
+    """Фоновая отправка уведомлений из таблицы notification_outbox."""
+
+    def __init__(
+        self,
+        batch_size: int = OUTBOX_BATCH_SIZE,
+        window: float = NOTIFICATION_DIGEST_WINDOW,
+    ):
+        self.batch_size = batch_size
+        self.window = timedelta(seconds=window)
+        self._wakeup = asyncio.Event()
+
+    def wake(self):
+        """Проверить очередь, не дожидаясь OUTBOX_POLL_INTERVAL."""
+        self._wakeup.set()
+
+    async def deliver(self, bot: Bot) -> int:
+        """Отправить одну пачку уведомлений.
+
+        Уведомления одного чата уходят одним сообщением. Возвращает число
+        взятых из очереди уведомлений.
+        """
+
+        async with get_db() as db:
+            rows = await claim_notifications(
+                db, self.batch_size, OUTBOX_LEASE, self.window
+            )
+        if not rows:
+            return 0
+        rows_by_chat = {}
+        for row in rows:
+            rows_by_chat.setdefault(row.chat_id, []).append(row)
+        results = await asyncio.gather(
+            *(
+                broadcaster.send(bot, chat_id, digest_text(chat_rows))
+                for chat_id, chat_rows in rows_by_chat.items()
+            )
+        )
+        now = datetime.now(timezone.utc)
+        delivered_ids, retries = [], []
+        for (chat_id, chat_rows), sent in zip(rows_by_chat.items(), results):
+            if sent:
+                delivered_ids.extend(row.id for row in chat_rows)
+                continue
+            attempts = max(row.attempts for row in chat_rows) + 1
+            if attempts >= OUTBOX_MAX_ATTEMPTS:
+                logger.error(
+                    "Уведомления в %s не доставлены за %s попыток",
+                    chat_id,
+                    attempts,
+                )
+                next_attempt = None
+            else:
+                next_attempt = now + retry_delay(attempts)
+            retries.extend((row.id, next_attempt) for row in chat_rows)
+        async with get_db() as db:
+            await finish_notifications(db, delivered_ids, retries)
+        delivered = sum(results)
+        logger.info(
+            "Уведомления: доставлено в %s чатов, не доставлено в %s",
+            delivered,
+            len(results) - delivered,
+        )
+        return len(rows)
+
+    async def run(self, bot: Bot):
+        """Отправлять уведомления, пока задача не будет отменена."""
+
+        # Уведомления уступают очередь ответам пользователям.
+        outbound_priority.set(BACKGROUND)
+        while True:
+            self._wakeup.clear()
+            try:
+                sent = await self.deliver(bot)
+            except Exception:
+                logger.exception("Ошибка отправки уведомлений")
+                sent = 0
+            if sent >= self.batch_size:
+                continue
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(), OUTBOX_POLL_INTERVAL
+                )
+            except asyncio.TimeoutError:
+                continue
+            # Новые уведомления копятся до конца окна, чтобы уйти одним
+            # сообщением.
+            await asyncio.sleep(self.window.total_seconds())
+
+
+outbox_worker = OutboxWorker()
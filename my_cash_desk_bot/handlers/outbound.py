@@ -0,0 +1,238 @@
+import asyncio
+import itertools
+import time
+from contextlib import suppress
+from contextvars import ContextVar
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import TelegramMethod
+from config import OUTBOUND_CHAT_BURST, OUTBOUND_CHAT_INTERVAL, OUTBOUND_RATE
+from handlers.metrics import (
+    OUTBOUND_QUEUE_DEPTH,
+    OUTBOUND_RETRY_AFTER,
+    OUTBOUND_WAIT_SECONDS,
+)
+
+# Приоритеты исходящих сообщений: ответы на текущий апдейт уходят раньше
+# фоновых отправок.
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+# Приоритет отправок текущей задачи. Фоновые задачи выставляют BACKGROUND
+# при запуске.
+outbound_priority = ContextVar("outbound_priority", default=INTERACTIVE)
+
+
+class TokenBucket:
+    """Ограничитель частоты: не больше rate событий в секунду.
+
+    Токены выдаются в долг: вызов, которому не хватило токена, ждет своей
+    очереди, поэтому ожидающие обслуживаются в порядке вызова.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._resume_at = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    async def acquire(self):
+        while True:
+            self._refill()
+            self._tokens -= 1
+            if self._tokens < 0:
+                await asyncio.sleep(-self._tokens / self.rate)
+            # Токен, полученный до конца паузы, пропадает, после паузы
+            # очередь выстраивается заново.
+            delay = self._resume_at - time.monotonic()
+            if delay <= 0:
+                return
+            await asyncio.sleep(delay)
+
+    def wait_time(self) -> float:
+        """Через сколько секунд можно будет взять токен."""
+        self._refill()
+        return max(
+            (1 - self._tokens) / self.rate,
+            self._resume_at - time.monotonic(),
+            0,
+        )
+
+    def try_acquire(self) -> bool:
+        """Взять токен без ожидания. Возвращает False, если его нет."""
+        if self.wait_time() > 0:
+            return False
+        self._tokens -= 1
+        return True
+
+    def is_full(self) -> bool:
+        self._refill()
+        return self._tokens >= self.capacity
+
+    def pause(self, seconds: float):
+        """Не выдавать токены ближайшие seconds секунд."""
+        self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+
+
+class OutboundScheduler:
+    """Общая очередь исходящих сообщений бота.
+
+    В один чат сообщения уходят не чаще раза в chat_interval секунд (с
+    запасом на chat_burst сообщений подряд), всего - не больше rate в
+    секунду. Очередную отправку получает ожидающий с наивысшим приоритетом
+    среди тех, чей чат не исчерпал лимит, при равном приоритете - пришедший
+    раньше. Поэтому фоновые сообщения не занимают лимит чата, в который
+    ждет отправки ответ пользователю.
+    """
+
+    def __init__(
+        self,
+        rate: float = OUTBOUND_RATE,
+        chat_interval: float = OUTBOUND_CHAT_INTERVAL,
+        chat_burst: int = OUTBOUND_CHAT_BURST,
+    ):
+        self.bucket = TokenBucket(rate)
+        self.chat_rate = 1 / chat_interval if chat_interval > 0 else None
+        self.chat_burst = chat_burst
+        self._chats = {}
+        # Ожидающие: (приоритет, порядковый номер, чат, future).
+        self._waiters = []
+        self._order = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._granter = None
+
+    def _chat_bucket(self, chat_id):
+        if self.chat_rate is None:
+            return None
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(self.chat_rate, self.chat_burst)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    def _chat_wait_time(self, chat_id) -> float:
+        bucket = self._chat_bucket(chat_id)
+        return bucket.wait_time() if bucket else 0
+
+    def _take_chat_token(self, chat_id):
+        bucket = self._chat_bucket(chat_id)
+        if bucket:
+            bucket.try_acquire()
+
+    def _next_waiter(self):
+        """Первый ожидающий, чей чат не исчерпал лимит.
+
+        Возвращает его (или None) и время до освобождения ближайшего чата.
+        """
+        self._waiters = [
+            waiter for waiter in self._waiters if not waiter[3].done()
+        ]
+        best, delay = None, None
+        for waiter in self._waiters:
+            wait = self._chat_wait_time(waiter[2])
+            if wait > 0:
+                delay = wait if delay is None else min(delay, wait)
+            elif best is None or waiter < best:
+                best = waiter
+        return best, delay
+
+    async def _grant(self):
+        while self._waiters:
+            waiter, delay = self._next_waiter()
+            if waiter is None:
+                if not self._waiters:
+                    break
+                # Ждем освобождения чата или нового ожидающего.
+                self._wakeup.clear()
+                with suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                continue
+            await self.bucket.acquire()
+            # Токен достается первому ожидающему на момент выдачи, поэтому
+            # ответ, пришедший во время ожидания, обгоняет фоновые отправки.
+            waiter, _ = self._next_waiter()
+            if waiter is None:
+                continue
+            self._waiters.remove(waiter)
+            self._take_chat_token(waiter[2])
+            waiter[3].set_result(None)
+        self._granter = None
+
+    async def acquire(self, chat_id, priority: int):
+        """Дождаться разрешения отправить сообщение в чат chat_id."""
+
+        # Уведомления из очереди адресуются строковым id чата, ответы -
+        # числовым, а лимит у чата общий.
+        chat_id = str(chat_id)
+        name = PRIORITY_NAMES[priority]
+        start = time.perf_counter()
+        if len(self._chats) > 10_000:
+            # Полные ведра ничем не отличаются от новых.
+            self._chats = {
+                chat: bucket
+                for chat, bucket in self._chats.items()
+                if not bucket.is_full()
+            }
+        if (
+            self._waiters
+            or self._chat_wait_time(chat_id) > 0
+            or not self.bucket.try_acquire()
+        ):
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(
+                (priority, next(self._order), chat_id, waiter)
+            )
+            self._wakeup.set()
+            if self._granter is None:
+                self._granter = asyncio.create_task(self._grant())
+            OUTBOUND_QUEUE_DEPTH.labels(name).inc()
+            try:
+                await waiter
+            finally:
+                OUTBOUND_QUEUE_DEPTH.labels(name).dec()
+        else:
+            self._take_chat_token(chat_id)
+        OUTBOUND_WAIT_SECONDS.labels(name).observe(time.perf_counter() - start)
+
+    def pause(self, seconds: float):
+        """Приостановить все отправки на seconds секунд."""
+        OUTBOUND_RETRY_AFTER.inc()
+        self.bucket.pause(seconds)
+
+
+class ScheduledSession(AiohttpSession):
+    """Сессия Bot API, пропускающая отправки в чаты через планировщик.
+
+    Запросы без chat_id (ответы на callback, загрузка файлов и т.п.)
+    выполняются сразу.
+    """
+
+    def __init__(self, scheduler: OutboundScheduler, **kwargs):
+        super().__init__(**kwargs)
+        self.scheduler = scheduler
+
+    async def make_request(
+        self, bot: Bot, method: TelegramMethod, timeout: int = None
+    ):
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is not None:
+            await self.scheduler.acquire(chat_id, outbound_priority.get())
+        try:
+            return await super().make_request(bot, method, timeout)
+        except TelegramRetryAfter as error:
+            self.scheduler.pause(error.retry_after)
+            raise
+
+
+outbound_scheduler = OutboundScheduler()
@@ -0,0 +1,130 @@
+from datetime import datetime, timezone
+
+from aiogram import Dispatcher, types
+from aiogram.filters import Command, CommandObject
+from config import ADMIN_IDS
+from handlers.export_data import DATE_FORMAT
+from models.crud import (
+    get_period_totals,
+    get_unpaid_totals_by_counterparty,
+    get_unpaid_totals_by_user,
+)
+from models.data_base import CashRequest, NoCashRequest
+from models.metrics import query_stats
+from sqlalchemy.ext.asyncio import AsyncSession
+
+REPORT_REQUEST_TYPES = (
+    ("cash", "Наличные", CashRequest),
+    ("non_cash", "Безналичные", NoCashRequest),
+)
+
+
+def parse_report_args(args: str):
+    """Разобрать аргументы /report: [начало] [конец].
+
+    Обе даты включаются в период. По умолчанию отчет строится с начала
+    текущего месяца по сегодняшний день (UTC).
+    """
+
+    today = datetime.now(timezone.utc).date()
+    dates = [
+        datetime.strptime(arg, DATE_FORMAT).date()
+        for arg in (args or "").split()
+    ]
+    if len(dates) > 2:
+        raise ValueError("слишком много дат")
+    date_from = dates[0] if dates else today.replace(day=1)
+    date_to = dates[1] if len(dates) == 2 else today
+    return date_from, date_to
+
+
+def format_totals(count, amount) -> str:
+    return f"{count or 0} на {amount or 0} руб."
+
+
+async def build_report(db: AsyncSession, date_from, date_to) -> str:
+    lines = [
+        f"Отчет с {date_from.strftime(DATE_FORMAT)} "
+        f"по {date_to.strftime(DATE_FORMAT)}",
+        "",
+    ]
+    period_totals = await get_period_totals(db, date_from, date_to)
+    for request_type, title, _ in REPORT_REQUEST_TYPES:
+        totals = period_totals.get(request_type)
+        lines.append(f"{title}:")
+        lines.append(
+            "Создано: "
+            + format_totals(
+                totals and totals.created_count,
+                totals and totals.created_amount,
+            )
+        )
+        lines.append(
+            "Оплачено: "
+            + format_totals(
+                totals and totals.paid_count, totals and totals.paid_amount
+            )
+        )
+        lines.append("")
+
+    lines.append("Не оплачено сейчас:")
+    for _, title, model in REPORT_REQUEST_TYPES:
+        by_user = await get_unpaid_totals_by_user(db, model)
+        lines.append("")
+        lines.append(
+            f"{title}: "
+            + format_totals(
+                sum(row.count for row in by_user),
+                sum(row.amount or 0 for row in by_user),
+            )
+        )
+        if not by_user:
+            continue
+        lines.append("По авторам:")
+        lines.extend(
+            f"{row.username}: {format_totals(row.count, row.amount)}"
+            for row in by_user
+        )
+        lines.append("Крупнейшие контрагенты:")
+        lines.extend(
+            f"{row.name or 'Без контрагента'}: "
+            f"{format_totals(row.count, row.amount)}"
+            for row in await get_unpaid_totals_by_counterparty(db, model)
+        )
+    return "\n".join(lines)
+
+
+async def report_handler(
+    message: types.Message, command: CommandObject, db: AsyncSession
+):
+    """Отчет по заявкам за период и по неоплаченным заявкам."""
+
+    if message.from_user.id not in ADMIN_IDS:
+        await message.answer("Отчеты доступны только администраторам.")
+        return
+    try:
+        date_from, date_to = parse_report_args(command.args)
+    except ValueError:
+        await message.answer(
+            "Формат команды: /report [ДД.ММ.ГГГГ] [ДД.ММ.ГГГГ]"
+        )
+        return
+    await message.answer(await build_report(db, date_from, date_to))
+
+
+async def db_stats_handler(message: types.Message, command: CommandObject):
+    """Сводка SQL-запросов процесса. /dbstats reset обнуляет ее."""
+
+    if message.from_user.id not in ADMIN_IDS:
+        await message.answer("Отчеты доступны только администраторам.")
+        return
+    await message.answer(query_stats.format())
+    if (command.args or "").strip() == "reset":
+        query_stats.clear()
+
+
+def register_handlers_reports(dp: Dispatcher):
+    dp.message.register(report_handler, Command("report"))
+    dp.message.register(
+        db_stats_handler, Command("dbstats"), flags={"db": False}
+    )
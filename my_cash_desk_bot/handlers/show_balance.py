@@ -1,12 +1,9 @@
 from aiogram import Dispatcher, F, types
 from aiogram.fsm.context import FSMContext
-from models.crud import get_user_cash_balance, get_user_non_cash_balance
-from sqlalchemy.orm import Session
+from models.data_base import User
 
 
-async def show_balance_handler(
-    message: types.Message, state: FSMContext, db: Session
-):
+async def show_balance_handler(message: types.Message, state: FSMContext):
     """Показать текущий баланс."""
 
     keybord = types.ReplyKeyboardMarkup(
@@ -20,31 +17,37 @@ async def show_balance_handler(
 
 
 async def show_cash_balance_handler(
-    message: types.Message, state: FSMContext, db: Session
+    message: types.Message, state: FSMContext, user: User
 ):
     """Показатель баланс наличной кассы пользователя."""
 
-    user_id = str(message.from_user.id)
-    cash_balance = get_user_cash_balance(db, user_id)
-    await message.answer(f"Ваш баланс наличной кассы {cash_balance} руб.")
+    # Кэш пользователя сбрасывается после каждого изменения баланса.
+    await message.answer(f"Ваш баланс наличной кассы {user.cash_balance} руб.")
 
 
 async def show_noncash_balance_handler(
-    message: types.Message, state: FSMContext, db: Session
+    message: types.Message, state: FSMContext, user: User
 ):
     """Показатель баланс безналичной кассы пользователя."""
 
-    user_id = str(message.from_user.id)
-    noncash_balance = get_user_non_cash_balance(db, user_id)
-    await message.answer(f"Ваш баланс наличной кассы {noncash_balance} руб.")
+    await message.answer(
+        f"Ваш баланс наличной кассы {user.non_cash_balance} руб."
+    )
 
 
 def reqister_handlers_show_balance(db: Dispatcher):
     db.message.register(
         show_balance_handler,
         F.text == "Проверить баланс",
+        flags={"db": False},
+    )
+    db.message.register(
+        show_cash_balance_handler,
+        F.text == "Наличная касса",
+        flags={"db": False},
     )
-    db.message.register(show_cash_balance_handler, F.text == "Наличная касса")
     db.message.register(
-        show_noncash_balance_handler, F.text == "Безналичная касса"
+        show_noncash_balance_handler,
+        F.text == "Безналичная касса",
+        flags={"db": False},
     )
@@ -7,12 +7,17 @@ from handlers.ultils import (
     create_navigation_buttons,
     create_pay_button,
 )
-from models.crud import get_unpaid_cash_request, get_unpaid_no_cash_request
-from sqlalchemy.orm import Session
+from models.crud import (
+    count_unpaid_cash_requests,
+    count_unpaid_no_cash_requests,
+    get_unpaid_cash_requests_page,
+    get_unpaid_no_cash_requests_page,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
 
 
 async def show_unpaid_requests_handler(
-    message: types.Message, state: FSMContext, db: Session
+    message: types.Message, state: FSMContext
 ):
     """Показать текущие неоплаченные заявки."""
 
@@ -27,20 +32,23 @@ async def show_unpaid_requests_handler(
 
 
 async def show_unpaid_cash_requests_handler(
-    message: types.Message, state: FSMContext, db: Session, page: int = 0
+    message: types.Message,
+    state: FSMContext,
+    db: AsyncSession,
+    page: int = 0,
+    after_id: int = None,
+    before_id: int = None,
 ):
     """Показать неоплаченные наличные заявки."""
 
-    unpaid_cash_requests = get_unpaid_cash_request(db)
-    if not unpaid_cash_requests:
+    requests_page = await get_unpaid_cash_requests_page(
+        db, PAGE_SIZE, after_id=after_id, before_id=before_id
+    )
+    if not requests_page:
         await message.answer("Нет текущих неоплаченных заявок.")
         await state.set_state(RequestStates.choosing_request_type)
         return
 
-    start = page * PAGE_SIZE
-    end = start + PAGE_SIZE
-    requests_page = unpaid_cash_requests[start:end]
-
     response = "Текущие неоплаченные заявки:\n\n"
     for request in requests_page:
         response += (
@@ -56,7 +64,11 @@ async def show_unpaid_cash_requests_handler(
         await message.answer(response, reply_markup=keyboard)
         response = ""
     navigation_keyboard = create_navigation_buttons(
-        page, len(unpaid_cash_requests), "cash"
+        page,
+        await count_unpaid_cash_requests(db),
+        "cash",
+        requests_page[0].id,
+        requests_page[-1].id,
     )
     if navigation_keyboard.inline_keyboard:
         await message.answer(
@@ -65,20 +77,23 @@ async def show_unpaid_cash_requests_handler(
 
 
 async def show_unpaid_noncash_requests_handler(
-    message: types.Message, state: FSMContext, db: Session, page: int = 0
+    message: types.Message,
+    state: FSMContext,
+    db: AsyncSession,
+    page: int = 0,
+    after_id: int = None,
+    before_id: int = None,
 ):
     """Показать неоплаченные безналичные оплаты."""
 
-    unpaid_nocash_requests = get_unpaid_no_cash_request(db)
-    if not unpaid_nocash_requests:
+    requests_page = await get_unpaid_no_cash_requests_page(
+        db, PAGE_SIZE, after_id=after_id, before_id=before_id
+    )
+    if not requests_page:
         await message.answer("Нет текущих неоплаченных заявок.")
         await state.set_state(RequestStates.choosing_request_type)
         return
 
-    start = page * PAGE_SIZE
-    end = start + PAGE_SIZE
-    requests_page = unpaid_nocash_requests[start:end]
-
     response = "Текущие неоплаченные заявки:\n\n"
     for request in requests_page:
         response += (
@@ -95,7 +110,11 @@ async def show_unpaid_noncash_requests_handler(
         await message.answer(response, reply_markup=keyboard)
         response = ""
     navigation_keyboard = create_navigation_buttons(
-        page, len(unpaid_nocash_requests), "cash"
+        page,
+        await count_unpaid_no_cash_requests(db),
+        "noncash",
+        requests_page[0].id,
+        requests_page[-1].id,
     )
     if navigation_keyboard.inline_keyboard:
         await message.answer(
@@ -104,7 +123,7 @@ async def show_unpaid_noncash_requests_handler(
 
 
 async def choose_cash_request_type_handler(
-    message: types.Message, state: FSMContext, db: Session
+    message: types.Message, state: FSMContext, db: AsyncSession
 ):
     """Обработчик выбора наличной заявки"""
 
@@ -112,7 +131,7 @@ async def choose_cash_request_type_handler(
 
 
 async def choose_noncash_request_type_handler(
-    message: types.Message, state: FSMContext, db: Session
+    message: types.Message, state: FSMContext, db: AsyncSession
 ):
     """Обработчик выбора безналичной заявки"""
 
@@ -123,6 +142,7 @@ def register_handlers_show_requests(dp: Dispatcher):
     dp.message.register(
         show_unpaid_requests_handler,
         F.text == "Посмотреть текущие не оплаченные заявки",
+        flags={"db": False},
     )
     dp.message.register(
         choose_cash_request_type_handler,
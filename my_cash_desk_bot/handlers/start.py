@@ -1,13 +1,14 @@
 import os
 
 from aiogram import BaseMiddleware, Dispatcher, types
+from aiogram.dispatcher.flags import get_flag
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from dotenv import load_dotenv
-from models.crud import create_user, get_user
+from models.crud import create_user, get_cached_user
 from models.deps import get_db
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 load_dotenv()
 
@@ -21,17 +22,56 @@ class AuthStates(StatesGroup):
 
 
 class DatabaseMiddleware(BaseMiddleware):
+    """Передает в обработчик ленивую сессию базы данных.
+
+    Обработчики, зарегистрированные с флагом ``db=False``, сессию не
+    получают.
+    """
+
     async def __call__(self, handler, event, data):
+        if not get_flag(data, "db", default=True):
+            return await handler(event, data)
         async with get_db() as db:
             data["db"] = db
             return await handler(event, data)
 
 
+class AuthMiddleware(BaseMiddleware):
+    """Передает в обработчик зарегистрированного пользователя.
+
+    Пользователь берется из кэша и загружается из базы только при промахе.
+    Незарегистрированным пользователям обработчик не вызывается.
+    Обработчики с флагом ``auth=False`` доступны всем и пользователя не
+    получают.
+    """
+
+    async def __call__(self, handler, event, data):
+        if not get_flag(data, "auth", default=True):
+            return await handler(event, data)
+        telegram_id = str(data["event_from_user"].id)
+        if "db" in data:
+            user = await get_cached_user(data["db"], telegram_id)
+        else:
+            async with get_db() as db:
+                user = await get_cached_user(db, telegram_id)
+        if user is None:
+            text = "Вы не зарегистрированы. Отправьте /start для регистрации."
+            if isinstance(event, types.CallbackQuery):
+                await event.answer(text, show_alert=True)
+            elif isinstance(event, types.InlineQuery):
+                await event.answer([], cache_time=0, is_personal=True)
+            else:
+                await event.answer(text)
+            return None
+        data["user"] = user
+        return await handler(event, data)
+
+
 async def start_handler(
-    message: types.Message, state: FSMContext, db: Session
+    message: types.Message, state: FSMContext, db: AsyncSession
 ):
     telegram_id = str(message.from_user.id)
-    user = get_user(db, telegram_id)
+    user = await get_cached_user(db, telegram_id)
 
     if user:
         keyboard = types.ReplyKeyboardMarkup(
@@ -58,9 +98,7 @@ async def start_handler(
         await state.set_state(AuthStates.waiting_for_password)
 
 
-async def password_handler(
-    message: types.Message, state: FSMContext, db: Session
-):
+async def password_handler(message: types.Message, state: FSMContext):
     if message.text == VALID_PASSWORD:
         await state.update_data(
             telegram_id=str(message.from_user.id),
@@ -72,9 +110,7 @@ async def password_handler(
         await message.answer("Неверный пароль. Попробуйте снова:")
 
 
-async def cash_balance_handler(
-    message: types.Message, state: FSMContext, db: Session
-):
+async def cash_balance_handler(message: types.Message, state: FSMContext):
     try:
         cash_balance = int(message.text)
     except ValueError:
@@ -89,7 +125,7 @@ async def cash_balance_handler(
 
 
 async def non_cash_balance_handler(
-    message: types.Message, state: FSMContext, db: Session
+    message: types.Message, state: FSMContext, db: AsyncSession
 ):
     try:
         non_cash_balance = int(message.text)
@@ -103,7 +139,9 @@ async def non_cash_balance_handler(
     telegram_id = user_data["telegram_id"]
     username = user_data["username"]
     cash_balance = user_data["cash_balance"]
-    create_user(db, telegram_id, username, cash_balance, non_cash_balance)
+    await create_user(
+        db, telegram_id, username, cash_balance, non_cash_balance
+    )
     keyboard = types.ReplyKeyboardMarkup(
         keyboard=[
             [types.KeyboardButton(text="Создать заявку")],
@@ -131,12 +169,26 @@ async def cancel_handler(message: types.Message, state: FSMContext):
 
 
 def register_handlers_start(dp: Dispatcher):
-    dp.message.register(start_handler, Command(commands=["start"]))
-    dp.message.register(password_handler, AuthStates.waiting_for_password)
     dp.message.register(
-        cash_balance_handler, AuthStates.waiting_for_cash_balance
+        start_handler, Command(commands=["start"]), flags={"auth": False}
+    )
+    dp.message.register(
+        password_handler,
+        AuthStates.waiting_for_password,
+        flags={"db": False, "auth": False},
+    )
+    dp.message.register(
+        cash_balance_handler,
+        AuthStates.waiting_for_cash_balance,
+        flags={"db": False, "auth": False},
+    )
+    dp.message.register(
+        non_cash_balance_handler,
+        AuthStates.waiting_for_non_cash_balance,
+        flags={"auth": False},
     )
     dp.message.register(
-        non_cash_balance_handler, AuthStates.waiting_for_non_cash_balance
+        cancel_handler,
+        Command(commands=["cancel"]),
+        flags={"db": False, "auth": False},
     )
-    dp.message.register(cancel_handler, Command(commands=["cancel"]))
@@ -1,6 +1,4 @@
-from aiogram import Bot, types
-from models.crud import get_all_users
-from sqlalchemy.orm import Session
+from aiogram import types
 
 PAGE_SIZE = 5
 
@@ -71,36 +69,33 @@ def create_change_requests_buttons(
 
 
 def create_navigation_buttons(
-    page: int, total_requests: int, prefix: str
+    page: int,
+    total_requests: int,
+    prefix: str,
+    first_id: int = None,
+    last_id: int = None,
 ) -> types.InlineKeyboardMarkup:
-    """Создание кнопок навигации для пагинации"""
+    """Создание кнопок навигации для пагинации.
+
+    В callback_data передается id крайней заявки на странице, чтобы
+    следующая страница выбиралась по ключу, а не смещением.
+    """
 
     buttons = []
     if page > 0:
         buttons.append(
             types.InlineKeyboardButton(
-                text="Назад", callback_data=f"{prefix}_page_{page - 1}"
+                text="Назад",
+                callback_data=f"{prefix}_page_{page - 1}_b{first_id}",
             )
         )
     if (page + 1) * PAGE_SIZE < total_requests:
         buttons.append(
             types.InlineKeyboardButton(
-                text="Вперед", callback_data=f"{prefix}_page_{page + 1}"
+                text="Вперед",
+                callback_data=f"{prefix}_page_{page + 1}_a{last_id}",
             )
         )
 
     navigation_keyboard = types.InlineKeyboardMarkup(inline_keyboard=[buttons])
     return navigation_keyboard
-
-
-async def notify_all_users(bot: Bot, db: Session, message: str):
-    """Отправить уведомление всем пользователям."""
-    users = get_all_users(db)
-    for user in users:
-        try:
-            await bot.send_message(user.telegram_id, message)
-        except Exception as e:
-            print(
-                f"Не удалось отправить сообщение пользователю"
-                f" {user.telegram_id}: {e}"
-            )
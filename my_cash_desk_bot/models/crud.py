@@ -1,20 +1,61 @@
-from models.data_base import CashRequest, Counterparty, NoCashRequest, User
-from sqlalchemy.orm import Session
+from datetime import date, datetime, timedelta, timezone
 
+from models.data_base import (
+    BalanceMovement,
+    CashRequest,
+    Counterparty,
+    DailyRequestTotal,
+    NoCashRequest,
+    NotificationOutbox,
+    User,
+    normalize_counterparty_name,
+)
+from models.user_cache import invalidate_on_commit, user_cache
+from sqlalchemy import (
+    and_,
+    bindparam,
+    case,
+    delete,
+    func,
+    insert,
+    literal,
+    or_,
+    select,
+    update,
+)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 
-def get_user(db: Session, telegram_id: str):
+
+async def get_user(db: AsyncSession, telegram_id: str):
     """Получить пользователя по telegram_id."""
-    return db.query(User).filter(User.telegram_id == telegram_id).first()
+    return await db.scalar(select(User).where(User.telegram_id == telegram_id))
+
 
+async def get_cached_user(db: AsyncSession, telegram_id: str):
+    """Получить пользователя по telegram_id через кэш пользователей.
+
+    Возвращается отсоединенный от сессии объект: его нельзя изменять или
+    передавать в db.add/db.delete.
+    """
+    user = user_cache.get(telegram_id)
+    if user is None:
+        user = await get_user(db, telegram_id)
+        if user is not None:
+            db.expunge(user)
+            user_cache.set(user)
+    return user
 
-def get_all_users(db: Session):
+
+async def get_all_users(db: AsyncSession):
     """Получить всех пользователей."""
 
-    return db.query(User).all()
+    return (await db.scalars(select(User))).all()
 
 
-def create_user(
-    db: Session,
+async def create_user(
+    db: AsyncSession,
     telegram_id: str,
     username: str,
     cash_balance: int = 0,
@@ -23,67 +64,217 @@ def create_user(
     db_user = User(
         telegram_id=telegram_id,
         username=username,
-        cash_balance=cash_balance,
-        non_cash_balance=non_cash_balance,
+        cash_balance=0,
+        non_cash_balance=0,
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.flush()
+    invalidate_on_commit(db, db_user.id)
+    await add_balance_movement(db, db_user.id, "cash", cash_balance, "opening")
+    await add_balance_movement(
+        db, db_user.id, "non_cash", non_cash_balance, "opening"
+    )
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 
-def get_user_cash_balance(db: Session, telegram_id: str):
+async def get_user_cash_balance(db: AsyncSession, telegram_id: str):
     """Показать баланс наличной кассы."""
 
-    request_user = (
-        db.query(User).filter(User.telegram_id == telegram_id).first()
+    request_user = await db.scalar(
+        select(User).where(User.telegram_id == telegram_id)
     )
     if request_user:
         return request_user.cash_balance
     return "Пользователь не зарегестрирован."
 
 
-def get_user_non_cash_balance(db: Session, telegram_id: str):
+async def get_user_non_cash_balance(db: AsyncSession, telegram_id: str):
     """Показать баланс безналичной кассы."""
 
-    request_user = (
-        db.query(User).filter(User.telegram_id == telegram_id).first()
+    request_user = await db.scalar(
+        select(User).where(User.telegram_id == telegram_id)
     )
     if request_user:
         return request_user.non_cash_balance
     return "Пользователь не зарегестрирован."
 
 
-def update_user_balance(
-    db: Session, user_id: int, cash_balance: int, non_cash_balance: int
+# Движения по кассам. Балансы меняются только через журнал
+# balance_movements и атомарным UPDATE на стороне базы данных.
+
+BALANCE_COLUMNS = {
+    "cash": User.cash_balance,
+    "non_cash": User.non_cash_balance,
+}
+
+# Касса и поле ссылки на заявку в журнале для каждого типа заявок.
+REQUEST_CASH_DESKS = {
+    CashRequest: ("cash", "cash_request_id"),
+    NoCashRequest: ("non_cash", "no_cash_request_id"),
+}
+
+
+async def add_balance_movement(
+    db: AsyncSession,
+    user_id: int,
+    cash_desk: str,
+    amount: int,
+    reason: str,
+    cash_request_id: int = None,
+    no_cash_request_id: int = None,
 ):
-    user = get_user(db, user_id)
-    if user:
-        user.cash_balance = cash_balance
-        user.non_cash_balance = non_cash_balance
-        db.commit()
-        db.refresh(user)
-    return user
+    """Записать движение по кассе и изменить баланс без коммита.
+
+    Баланс меняется выражением ``balance = balance + :amount``, поэтому
+    параллельные оплаты не перезаписывают друг друга.
+    """
+    if not amount:
+        return
+    invalidate_on_commit(db, user_id)
+    balance = BALANCE_COLUMNS[cash_desk]
+    await db.execute(
+        insert(BalanceMovement).values(
+            user_id=user_id,
+            cash_desk=cash_desk,
+            amount=amount,
+            reason=reason,
+            cash_request_id=cash_request_id,
+            no_cash_request_id=no_cash_request_id,
+        )
+    )
+    await db.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values({balance.key: balance + amount})
+    )
+
+
+async def adjust_user_balance(
+    db: AsyncSession,
+    user_id: int,
+    cash_amount: int = 0,
+    non_cash_amount: int = 0,
+    reason: str = "adjustment",
+):
+    """Пополнить или списать средства с касс пользователя."""
+
+    await add_balance_movement(db, user_id, "cash", cash_amount, reason)
+    await add_balance_movement(
+        db, user_id, "non_cash", non_cash_amount, reason
+    )
+    await db.commit()
+
+
+async def update_user_balance(
+    db: AsyncSession, user_id: int, cash_balance: int, non_cash_balance: int
+):
+    """Установить балансы касс, записав разницу в журнал движений."""
+
+    # Строка пользователя блокируется, чтобы разница считалась от
+    # актуального баланса.
+    current = (
+        await db.execute(
+            select(User.cash_balance, User.non_cash_balance)
+            .where(User.id == user_id)
+            .with_for_update()
+        )
+    ).first()
+    if current is None:
+        return None
+    await add_balance_movement(
+        db, user_id, "cash", cash_balance - current.cash_balance, "correction"
+    )
+    await add_balance_movement(
+        db,
+        user_id,
+        "non_cash",
+        non_cash_balance - current.non_cash_balance,
+        "correction",
+    )
+    await db.commit()
+    return await db.get(User, user_id, populate_existing=True)
 
 
-def delete_user(db: Session, user_id: int):
-    user = get_user(db, user_id)
+async def delete_user(db: AsyncSession, user_id: int):
+    user = await get_user(db, user_id)
     if user:
-        db.delete(user)
-        db.commit()
+        invalidate_on_commit(db, user.id)
+        await db.delete(user)
+        await db.commit()
     return user
 
 
-def get_counterparty(db: Session, counterparty_name: str):
-    return (
-        db.query(Counterparty)
-        .filter(Counterparty.name == counterparty_name)
-        .first()
+async def get_counterparty(db: AsyncSession, counterparty_name: str):
+    """Найти контрагента по имени без учета регистра и лишних пробелов."""
+    return await db.scalar(
+        select(Counterparty).where(
+            Counterparty.normalized_name
+            == normalize_counterparty_name(counterparty_name)
+        )
     )
 
 
-def create_counterparty(
-    db: Session, name: str, phone_or_card: str, bank: str, is_individual: bool
+# INSERT ... ON CONFLICT есть только в диалектных конструкциях insert.
+UPSERT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def _counterparty_upsert(
+    db: AsyncSession,
+    columns=("phone_or_card", "bank", "is_individual"),
+):
+    """INSERT контрагента с обновлением существующего по normalized_name.
+
+    У существующего контрагента обновляются только columns, причем пустые
+    реквизиты не затирают сохраненные.
+    """
+    statement = UPSERT_INSERTS[db.bind.dialect.name](Counterparty)
+    excluded = statement.excluded
+    values = {
+        column: func.coalesce(
+            excluded[column], Counterparty.__table__.c[column]
+        )
+        for column in columns
+    }
+    return statement.on_conflict_do_update(
+        index_elements=[Counterparty.normalized_name], set_=values
+    )
+
+
+async def upsert_counterparty(
+    db: AsyncSession,
+    name: str,
+    phone_or_card: str,
+    bank: str,
+    is_individual: bool,
+) -> int:
+    """Найти или создать контрагента одним запросом, без коммита.
+
+    Параллельные вызовы с одним именем не создают дублей: их разрешает
+    уникальный индекс по normalized_name. Непустые телефон/карта и банк
+    обновляют сохраненные, is_individual задается только при создании
+    контрагента. Возвращает id контрагента.
+    """
+    return await db.scalar(
+        _counterparty_upsert(db, columns=("phone_or_card", "bank"))
+        .values(
+            name=name,
+            normalized_name=normalize_counterparty_name(name),
+            phone_or_card=phone_or_card,
+            bank=bank,
+            is_individual=is_individual,
+        )
+        .returning(Counterparty.id)
+    )
+
+
+async def create_counterparty(
+    db: AsyncSession,
+    name: str,
+    phone_or_card: str,
+    bank: str,
+    is_individual: bool,
 ):
     db_counterparty = Counterparty(
         name=name,
@@ -92,57 +283,262 @@ def create_counterparty(
         is_individual=is_individual,
     )
     db.add(db_counterparty)
-    db.commit()
-    db.refresh(db_counterparty)
+    await db.commit()
+    await db.refresh(db_counterparty)
     return db_counterparty
 
 
-def update_counterparty(
-    db: Session,
+async def update_counterparty(
+    db: AsyncSession,
     counterparty_id: int,
     name: str,
     phone_or_card: str,
     bank: str,
     is_individual: bool,
 ):
-    counterparty = get_counterparty(db, counterparty_id)
+    counterparty = await db.get(Counterparty, counterparty_id)
     if counterparty:
         counterparty.name = name
         counterparty.phone_or_card = phone_or_card
         counterparty.bank = bank
         counterparty.is_individual = is_individual
-        db.commit()
-        db.refresh(counterparty)
+        await db.commit()
+        await db.refresh(counterparty)
     return counterparty
 
 
-def delete_counterparty(db: Session, counterparty_id: int):
-    counterparty = get_counterparty(db, counterparty_id)
+async def delete_counterparty(db: AsyncSession, counterparty_id: int):
+    counterparty = await db.get(Counterparty, counterparty_id)
     if counterparty:
-        db.delete(counterparty)
-        db.commit()
+        await db.delete(counterparty)
+        await db.commit()
     return counterparty
 
 
+# Дневные итоги заявок для отчетов. Обновляются без коммита, в
+# транзакции вызывающей функции.
+
+DAILY_TOTAL_COLUMNS = (
+    "created_count",
+    "created_amount",
+    "paid_count",
+    "paid_amount",
+)
+
+
+async def _add_daily_totals(db: AsyncSession, request_model, **totals):
+    """Прибавить приращения полей DAILY_TOTAL_COLUMNS к итогам дня.
+
+    День берется из базы (CURRENT_DATE), как и created_at заявок.
+    """
+    statement = UPSERT_INSERTS[db.bind.dialect.name](DailyRequestTotal)
+    table = DailyRequestTotal.__table__
+    await db.execute(
+        statement.values(
+            day=func.current_date(),
+            request_type=REQUEST_CASH_DESKS[request_model][0],
+            **{
+                column: totals.get(column, 0) for column in DAILY_TOTAL_COLUMNS
+            },
+        ).on_conflict_do_update(
+            index_elements=[table.c.day, table.c.request_type],
+            set_={
+                column: table.c[column] + statement.excluded[column]
+                for column in DAILY_TOTAL_COLUMNS
+            },
+        )
+    )
+
+
+def _created_totals(rows: list) -> dict:
+    """Приращения итогов для новых заявок, заданных словарями полей."""
+    paid = [row.get("amount") or 0 for row in rows if row.get("status")]
+    return {
+        "created_count": len(rows),
+        "created_amount": sum(row.get("amount") or 0 for row in rows),
+        "paid_count": len(paid),
+        "paid_amount": sum(paid),
+    }
+
+
+async def _add_paid_totals(
+    db: AsyncSession, request_model, status: bool, amounts: list
+):
+    """Учесть смену статуса заявок с суммами amounts.
+
+    Снятие оплаты вычитается из итогов текущего дня, а не дня оплаты.
+    """
+    sign = 1 if status else -1
+    await _add_daily_totals(
+        db,
+        request_model,
+        paid_count=sign * len(amounts),
+        paid_amount=sign * sum(amount or 0 for amount in amounts),
+    )
+
+
+# Постраничный вывод неоплаченных заявок.
+
+
+async def _get_unpaid_page(
+    db: AsyncSession,
+    model,
+    limit: int,
+    after_id: int = None,
+    before_id: int = None,
+):
+    """Страница неоплаченных заявок с пагинацией по ключу id.
+
+    Контрагент и автор заявки загружаются тем же запросом.
+
+    after_id - вернуть заявки после указанной (следующая страница),
+    before_id - вернуть заявки перед указанной (предыдущая страница).
+    """
+    query = (
+        select(model)
+        .options(joinedload(model.counterparty), joinedload(model.user))
+        .where(model.status.is_(False))
+        .limit(limit)
+    )
+    if before_id is not None:
+        query = query.where(model.id < before_id).order_by(model.id.desc())
+        return list(reversed((await db.scalars(query)).all()))
+    if after_id is not None:
+        query = query.where(model.id > after_id)
+    return (await db.scalars(query.order_by(model.id))).all()
+
+
+async def _count_unpaid(db: AsyncSession, model) -> int:
+    return await db.scalar(
+        select(func.count()).select_from(model).where(model.status.is_(False))
+    )
+
+
+# Оплата заявок несколькими кассирами.
+
+
+def _claimable(model, user_id: int, timeout: timedelta):
+    """Условие: заявка не оплачена и не занята другим кассиром."""
+    return and_(
+        model.status.is_(False),
+        or_(
+            model.claimed_by.is_(None),
+            model.claimed_by == user_id,
+            model.claimed_at < datetime.now(timezone.utc) - timeout,
+        ),
+    )
+
+
+async def _claim_request(
+    db: AsyncSession,
+    model,
+    user_id: int,
+    timeout: timedelta,
+    request_id: int = None,
+):
+    """Закрепить заявку за кассиром одним UPDATE.
+
+    Кандидат выбирается подзапросом с FOR UPDATE SKIP LOCKED, поэтому в
+    Postgres параллельные кассиры не ждут друг друга, а получают разные
+    заявки. В SQLite блокировок строк нет, и от двойного захвата
+    защищает повторная проверка условия в самом UPDATE.
+    """
+    candidate = (
+        select(model.id)
+        .where(_claimable(model, user_id, timeout))
+        .order_by(model.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    )
+    if request_id is not None:
+        candidate = candidate.where(model.id == request_id)
+    claimed_id = await db.scalar(
+        update(model)
+        .where(
+            model.id == candidate.scalar_subquery(),
+            _claimable(model, user_id, timeout),
+        )
+        .values(claimed_by=user_id, claimed_at=datetime.now(timezone.utc))
+        .returning(model.id)
+    )
+    await db.commit()
+    return claimed_id
+
+
+async def _pay_request(
+    db: AsyncSession,
+    model,
+    request_id: int,
+    payer_id: int,
+    **values,
+):
+    """Отметить заявку оплаченной и списать сумму с кассы плательщика.
+
+    Статус меняется, только если заявка еще не оплачена и не закреплена
+    за другим кассиром. Иначе возвращает None.
+    """
+    amount = await db.scalar(
+        update(model)
+        .where(
+            model.id == request_id,
+            model.status.is_(False),
+            or_(model.claimed_by.is_(None), model.claimed_by == payer_id),
+        )
+        .values(status=True, **values)
+        .returning(model.amount)
+    )
+    if amount is None:
+        await db.rollback()
+        return None
+    cash_desk, request_key = REQUEST_CASH_DESKS[model]
+    await add_balance_movement(
+        db,
+        payer_id,
+        cash_desk,
+        -amount,
+        "payment",
+        **{request_key: request_id},
+    )
+    await _add_daily_totals(db, model, paid_count=1, paid_amount=amount)
+    await db.commit()
+    return await db.get(model, request_id, populate_existing=True)
+
+
 # CashRequest CRUD operations.
 
 
-def get_cash_request(db: Session, cash_request_id: int):
-    return (
-        db.query(CashRequest).filter(CashRequest.id == cash_request_id).first()
+async def get_cash_request(db: AsyncSession, cash_request_id: int):
+    return await db.scalar(
+        select(CashRequest)
+        .options(joinedload(CashRequest.counterparty))
+        .where(CashRequest.id == cash_request_id)
     )
 
 
-def get_unpaid_cash_request(db: Session):
+async def get_unpaid_cash_request(db: AsyncSession):
     """Получение неоплаченных наличных заявок."""
     cash_requests = (
-        db.query(CashRequest).filter(CashRequest.status.is_(False)).all()
-    )
+        await db.scalars(
+            select(CashRequest).where(CashRequest.status.is_(False))
+        )
+    ).all()
     return cash_requests
 
 
-def create_cash_request(
-    db: Session,
+async def get_unpaid_cash_requests_page(
+    db: AsyncSession, limit: int, after_id: int = None, before_id: int = None
+):
+    """Страница неоплаченных наличных заявок."""
+    return await _get_unpaid_page(db, CashRequest, limit, after_id, before_id)
+
+
+async def count_unpaid_cash_requests(db: AsyncSession) -> int:
+    """Количество неоплаченных наличных заявок."""
+    return await _count_unpaid(db, CashRequest)
+
+
+async def create_cash_request(
+    db: AsyncSession,
     user_id: int,
     counterparty_id: int,
     amount: int,
@@ -157,65 +553,119 @@ def create_cash_request(
         status=status,
     )
     db.add(db_cash_request)
-    db.commit()
-    db.refresh(db_cash_request)
+    await _add_daily_totals(
+        db,
+        CashRequest,
+        **_created_totals([{"amount": amount, "status": status}]),
+    )
+    await db.commit()
+    await db.refresh(db_cash_request)
     return db_cash_request
 
 
-def update_cash_request_status(
-    db: Session, request_id: int, status: bool, check_file: str
+async def update_cash_request_status(
+    db: AsyncSession,
+    request_id: int,
+    status: bool,
+    check_file: str,
+    payer_id: int = None,
 ):
-    request = get_cash_request(db, request_id)
+    """Изменить статус заявки.
+
+    Если заявку оплачивает пользователь payer_id, сумма списывается с его
+    кассы в той же транзакции, а заявка, закрепленная за другим
+    кассиром или уже оплаченная, не меняется (возвращается None).
+    """
+    if status and payer_id is not None:
+        return await _pay_request(
+            db, CashRequest, request_id, payer_id, check_file=check_file
+        )
+    request = await get_cash_request(db, request_id)
     if request:
+        if bool(request.status) != bool(status):
+            await _add_paid_totals(db, CashRequest, status, [request.amount])
         request.status = status
         request.check_file = check_file
-    db.commit()
-    db.refresh(request)
+    await db.commit()
+    await db.refresh(request)
     return request
 
 
-def update_cash_request(
-    db: Session, cash_request_id: int, amount: int, comment: str, status: bool
+async def claim_cash_request(
+    db: AsyncSession,
+    user_id: int,
+    timeout: timedelta,
+    request_id: int = None,
 ):
-    cash_request = get_cash_request(db, cash_request_id)
+    """Взять заявку в оплату. Без request_id берется первая свободная.
+
+    Возвращает id закрепленной заявки или None.
+    """
+    return await _claim_request(db, CashRequest, user_id, timeout, request_id)
+
+
+async def update_cash_request(
+    db: AsyncSession,
+    cash_request_id: int,
+    amount: int,
+    comment: str,
+    status: bool,
+):
+    cash_request = await get_cash_request(db, cash_request_id)
     if cash_request:
         cash_request.amount = amount
         cash_request.comment = comment
         cash_request.status = status
-        db.commit()
-        db.refresh(cash_request)
+        await db.commit()
+        await db.refresh(cash_request)
     return cash_request
 
 
-def delete_cash_request(db: Session, cash_request_id: int):
-    cash_request = get_cash_request(db, cash_request_id)
+async def delete_cash_request(db: AsyncSession, cash_request_id: int):
+    cash_request = await get_cash_request(db, cash_request_id)
     if cash_request:
-        db.delete(cash_request)
-        db.commit()
+        await db.delete(cash_request)
+        await db.commit()
     return cash_request
 
 
 # NoCashRequest CRUD operations
 
 
-def get_no_cash_request(db: Session, no_cash_request_id: int):
-    return (
-        db.query(NoCashRequest)
-        .filter(NoCashRequest.id == no_cash_request_id)
-        .first()
+async def get_no_cash_request(db: AsyncSession, no_cash_request_id: int):
+    return await db.scalar(
+        select(NoCashRequest)
+        .options(joinedload(NoCashRequest.counterparty))
+        .where(NoCashRequest.id == no_cash_request_id)
     )
 
 
-def get_unpaid_no_cash_request(db: Session):
+async def get_unpaid_no_cash_request(db: AsyncSession):
     """Получение неоплаченных безналичных заявок."""
     no_cash_requests = (
-        db.query(NoCashRequest).filter(NoCashRequest.status.is_(False)).all()
-    )
+        await db.scalars(
+            select(NoCashRequest).where(NoCashRequest.status.is_(False))
+        )
+    ).all()
     return no_cash_requests
 
 
-def create_no_cash_request(
-    db: Session,
+async def get_unpaid_no_cash_requests_page(
+    db: AsyncSession, limit: int, after_id: int = None, before_id: int = None
+):
+    """Страница неоплаченных безналичных заявок."""
+    return await _get_unpaid_page(
+        db, NoCashRequest, limit, after_id, before_id
+    )
+
+
+async def count_unpaid_no_cash_requests(db: AsyncSession) -> int:
+    """Количество неоплаченных безналичных заявок."""
+    return await _count_unpaid(db, NoCashRequest)
+
+
+async def create_no_cash_request(
+    db: AsyncSession,
     user_id: int,
     counterparty_id: int,
     amount: int,
@@ -232,45 +682,542 @@ def create_no_cash_request(
         status=status,
     )
     db.add(db_no_cash_request)
-    db.commit()
-    db.refresh(db_no_cash_request)
+    await _add_daily_totals(
+        db,
+        NoCashRequest,
+        **_created_totals([{"amount": amount, "status": status}]),
+    )
+    await db.commit()
+    await db.refresh(db_no_cash_request)
     return db_no_cash_request
 
 
-def update_no_cash_request_status(
-    db: Session, request_id: int, status: bool, payment_slip: str
+async def update_no_cash_request_status(
+    db: AsyncSession,
+    request_id: int,
+    status: bool,
+    payment_slip: str,
+    payer_id: int = None,
 ):
-    request = get_no_cash_request(db, request_id)
+    """Изменить статус заявки.
+
+    Если заявку оплачивает пользователь payer_id, сумма списывается с его
+    кассы в той же транзакции, а заявка, закрепленная за другим
+    кассиром или уже оплаченная, не меняется (возвращается None).
+    """
+    if status and payer_id is not None:
+        return await _pay_request(
+            db, NoCashRequest, request_id, payer_id, payment_slip=payment_slip
+        )
+    request = await get_no_cash_request(db, request_id)
     if request:
+        if bool(request.status) != bool(status):
+            await _add_paid_totals(db, NoCashRequest, status, [request.amount])
         request.status = status
         request.payment_slip = payment_slip
-    db.commit()
-    db.refresh(request)
+    await db.commit()
+    await db.refresh(request)
     return request
 
 
-def update_no_cash_request(
-    db: Session,
+async def claim_no_cash_request(
+    db: AsyncSession,
+    user_id: int,
+    timeout: timedelta,
+    request_id: int = None,
+):
+    """Взять заявку в оплату. Без request_id берется первая свободная.
+
+    Возвращает id закрепленной заявки или None.
+    """
+    return await _claim_request(
+        db, NoCashRequest, user_id, timeout, request_id
+    )
+
+
+async def update_no_cash_request(
+    db: AsyncSession,
     no_cash_request_id: int,
     amount: int,
     invoice_path: str,
     comment: str,
     status: bool,
 ):
-    no_cash_request = get_no_cash_request(db, no_cash_request_id)
+    no_cash_request = await get_no_cash_request(db, no_cash_request_id)
     if no_cash_request:
         no_cash_request.amount = amount
         no_cash_request.invoice_path = invoice_path
         no_cash_request.comment = comment
         no_cash_request.status = status
-        db.commit()
-        db.refresh(no_cash_request)
+        await db.commit()
+        await db.refresh(no_cash_request)
     return no_cash_request
 
 
-def delete_no_cash_request(db: Session, no_cash_request_id: int):
-    no_cash_request = get_no_cash_request(db, no_cash_request_id)
+async def delete_no_cash_request(db: AsyncSession, no_cash_request_id: int):
+    no_cash_request = await get_no_cash_request(db, no_cash_request_id)
     if no_cash_request:
-        db.delete(no_cash_request)
-        db.commit()
+        await db.delete(no_cash_request)
+        await db.commit()
     return no_cash_request
+
+
+# Очередь уведомлений. Уведомления отправляет фоновый обработчик,
+# см. handlers/notifications.py.
+
+
+async def enqueue_notification(
+    db: AsyncSession,
+    text: str,
+    amount: int = None,
+    counterparty_name: str = None,
+):
+    """Поставить уведомление всем пользователям в очередь, без коммита.
+
+    Сумма и контрагент заявки нужны для сводного уведомления, если за
+    окно накопления у пользователя соберется несколько уведомлений.
+    """
+    await db.execute(
+        insert(NotificationOutbox).from_select(
+            ["chat_id", "text", "amount", "counterparty_name"],
+            select(
+                User.telegram_id,
+                literal(text),
+                literal(amount, NotificationOutbox.amount.type),
+                literal(
+                    counterparty_name,
+                    NotificationOutbox.counterparty_name.type,
+                ),
+            ).where(User.telegram_id.isnot(None)),
+        )
+    )
+
+
+async def claim_notifications(
+    db: AsyncSession,
+    limit: int,
+    lease: timedelta,
+    window: timedelta = timedelta(0),
+) -> list:
+    """Взять в отправку уведомления чатов, в которых наступил срок отправки.
+
+    Срок наступает, когда подошло время очередной попытки, а с постановки
+    в очередь прошло больше window: окно для сбора сводки не добавляется к
+    задержке повторов. Вместе с уведомлением берутся все остальные
+    ожидающие уведомления того же чата, чтобы отправить их одним
+    сообщением. Рассматривается до limit уведомлений с наступившим сроком.
+    Взятым уведомлениям следующая попытка назначается через lease, так что
+    после падения процесса они будут отправлены снова. Возвращает строки
+    (id, chat_id, text, amount, counterparty_name, attempts) в порядке
+    постановки в очередь.
+    """
+    now = datetime.now(timezone.utc)
+    due_chats = (
+        select(NotificationOutbox.chat_id)
+        .where(
+            NotificationOutbox.next_attempt_at <= now,
+            NotificationOutbox.created_at <= now - window,
+        )
+        .order_by(NotificationOutbox.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    result = await db.execute(
+        update(NotificationOutbox)
+        .where(
+            NotificationOutbox.chat_id.in_(due_chats.scalar_subquery()),
+            NotificationOutbox.next_attempt_at.isnot(None),
+        )
+        .values(next_attempt_at=now + lease)
+        .returning(
+            NotificationOutbox.id,
+            NotificationOutbox.chat_id,
+            NotificationOutbox.text,
+            NotificationOutbox.amount,
+            NotificationOutbox.counterparty_name,
+            NotificationOutbox.attempts,
+        )
+    )
+    rows = sorted(result.all())
+    await db.commit()
+    return rows
+
+
+async def finish_notifications(
+    db: AsyncSession, delivered_ids: list, retries: list
+):
+    """Удалить доставленные уведомления и перенести недоставленные.
+
+    retries - пары (id, время следующей попытки или None, если попытки
+    исчерпаны).
+    """
+    if delivered_ids:
+        await db.execute(
+            delete(NotificationOutbox).where(
+                NotificationOutbox.id.in_(delivered_ids)
+            )
+        )
+    if retries:
+        table = NotificationOutbox.__table__
+        await db.execute(
+            table.update()
+            .where(table.c.id == bindparam("b_id"))
+            .values(
+                attempts=table.c.attempts + 1,
+                next_attempt_at=bindparam("b_next_attempt_at"),
+            ),
+            [
+                {"b_id": notification_id, "b_next_attempt_at": next_attempt}
+                for notification_id, next_attempt in retries
+            ],
+        )
+    await db.commit()
+
+
+# Создание заявки вместе с контрагентом.
+
+
+async def create_request_with_counterparty(
+    db: AsyncSession,
+    request_model,
+    user_id: int,
+    counterparty_name: str,
+    phone_or_card: str,
+    bank: str,
+    is_individual: bool,
+    notification: str = None,
+    **request_fields,
+) -> int:
+    """Создать заявку и, если нужно, контрагента в одной транзакции.
+
+    В той же транзакции всем пользователям ставится в очередь уведомление
+    notification, если оно передано. Идентификаторы новых строк
+    возвращаются через RETURNING, поэтому объекты не перечитываются из
+    базы. Возвращает id заявки.
+    """
+    counterparty_id = await upsert_counterparty(
+        db, counterparty_name, phone_or_card, bank, is_individual
+    )
+    request_id = await db.scalar(
+        insert(request_model)
+        .values(
+            user_id=user_id,
+            counterparty_id=counterparty_id,
+            **request_fields,
+        )
+        .returning(request_model.id)
+    )
+    await _add_daily_totals(
+        db, request_model, **_created_totals([request_fields])
+    )
+    if notification is not None:
+        await enqueue_notification(
+            db,
+            notification,
+            request_fields.get("amount"),
+            counterparty_name,
+        )
+    await db.commit()
+    return request_id
+
+
+# Пакетные операции. Каждая функция выполняет несколько
+# многострочных INSERT/UPDATE и один коммит на весь пакет. С commit=False
+# коммит остается вызывающему, чтобы записать несколько пакетов в одной
+# транзакции.
+
+BULK_CHUNK_SIZE = 1000
+
+
+def _chunks(items: list, size: int = BULK_CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+async def bulk_create_cash_requests(
+    db: AsyncSession, rows: list, commit: bool = True
+) -> list:
+    """Создать наличные заявки из списка словарей с полями модели.
+
+    Возвращает id созданных заявок.
+    """
+    return await _bulk_create_requests(db, CashRequest, rows, commit)
+
+
+async def bulk_create_no_cash_requests(
+    db: AsyncSession, rows: list, commit: bool = True
+) -> list:
+    """Создать безналичные заявки из списка словарей с полями модели."""
+    return await _bulk_create_requests(db, NoCashRequest, rows, commit)
+
+
+async def _bulk_create_requests(
+    db: AsyncSession, model, rows: list, commit: bool = True
+) -> list:
+    if not rows:
+        return []
+    ids = []
+    for chunk in _chunks(rows):
+        ids.extend(await db.scalars(insert(model).returning(model.id), chunk))
+    await _add_daily_totals(db, model, **_created_totals(rows))
+    if commit:
+        await db.commit()
+    return ids
+
+
+# Документ об оплате, без которого заявку нельзя отметить оплаченной.
+REQUEST_DOCUMENT_COLUMNS = {
+    CashRequest: "check_file",
+    NoCashRequest: "payment_slip",
+}
+
+
+async def bulk_update_status(
+    db: AsyncSession,
+    request_model,
+    request_ids: list,
+    status: bool,
+    payer_id: int = None,
+    document=None,
+) -> list:
+    """Изменить статус списка заявок одним UPDATE на пакет.
+
+    Меняются только заявки с другим статусом. Оплату заявок нужно
+    списывать с кассы payer_id и подтверждать документом (чеком для
+    наличных заявок, платежкой для безналичных): document - общий для всех
+    заявок или словарь {id заявки: документ}. Документ записывается тем же
+    UPDATE, без плательщика или документа вызывается ValueError.
+    Пропускаются заявки, закрепленные за другими кассирами, а общая сумма
+    списывается с кассы плательщика одним UPDATE. Возвращает id измененных
+    заявок.
+    """
+    request_ids = list(request_ids)
+    document_column = REQUEST_DOCUMENT_COLUMNS[request_model]
+    if status:
+        if payer_id is None:
+            raise ValueError("не указан плательщик")
+        documents = (
+            document
+            if isinstance(document, dict)
+            else dict.fromkeys(request_ids, document)
+        )
+        if not all(documents.get(request_id) for request_id in request_ids):
+            raise ValueError("не указан документ об оплате")
+    updated = []
+    for chunk in _chunks(request_ids):
+        query = update(request_model).where(
+            request_model.id.in_(chunk), request_model.status.isnot(status)
+        )
+        values = {"status": status}
+        if status:
+            query = query.where(
+                or_(
+                    request_model.claimed_by.is_(None),
+                    request_model.claimed_by == payer_id,
+                )
+            )
+            values[document_column] = (
+                case(
+                    {
+                        request_id: documents[request_id]
+                        for request_id in chunk
+                    },
+                    value=request_model.id,
+                )
+                if isinstance(document, dict)
+                else document
+            )
+        result = await db.execute(
+            query.values(values).returning(
+                request_model.id, request_model.amount
+            )
+        )
+        updated.extend(result.all())
+    if updated and status:
+        cash_desk, request_key = REQUEST_CASH_DESKS[request_model]
+        await db.execute(
+            insert(BalanceMovement),
+            [
+                {
+                    "user_id": payer_id,
+                    "cash_desk": cash_desk,
+                    "amount": -amount,
+                    "reason": "payment",
+                    request_key: request_id,
+                }
+                for request_id, amount in updated
+            ],
+        )
+        balance = BALANCE_COLUMNS[cash_desk]
+        invalidate_on_commit(db, payer_id)
+        await db.execute(
+            update(User)
+            .where(User.id == payer_id)
+            .values({balance.key: balance - sum(a for _, a in updated)})
+        )
+    if updated:
+        await _add_paid_totals(
+            db, request_model, status, [amount for _, amount in updated]
+        )
+    await db.commit()
+    return [request_id for request_id, _ in updated]
+
+
+async def bulk_upsert_counterparties(
+    db: AsyncSession, rows: list, commit: bool = True
+) -> dict:
+    """Создать или обновить контрагентов по имени.
+
+    rows - словари с полями name, phone_or_card, bank, is_individual.
+    Каждый пакет - один INSERT ... ON CONFLICT DO UPDATE. Непустые
+    реквизиты существующих контрагентов перезаписываются, пустые (None)
+    оставляют сохраненные. Возвращает словарь {имя: id}.
+    """
+    # Postgres не дает обновить одну строку дважды в одном запросе, поэтому
+    # при повторе имени в пакете остается последняя строка.
+    rows_by_key = {
+        normalize_counterparty_name(row["name"]): row for row in rows
+    }
+    statement = _counterparty_upsert(db).returning(
+        Counterparty.normalized_name, Counterparty.id
+    )
+    ids_by_key = {}
+    for keys in _chunks(list(rows_by_key)):
+        result = await db.execute(
+            statement,
+            [
+                {
+                    "name": rows_by_key[key]["name"],
+                    "normalized_name": key,
+                    "phone_or_card": rows_by_key[key].get("phone_or_card"),
+                    "bank": rows_by_key[key].get("bank"),
+                    "is_individual": rows_by_key[key].get("is_individual"),
+                }
+                for key in keys
+            ],
+        )
+        ids_by_key.update(result.all())
+    if commit:
+        await db.commit()
+    return {
+        row["name"]: ids_by_key[normalize_counterparty_name(row["name"])]
+        for row in rows
+    }
+
+
+# Выгрузка истории заявок.
+
+# Сколько строк за раз забирается из серверного курсора.
+EXPORT_YIELD_PER = 1000
+
+
+async def stream_request_history(
+    db: AsyncSession,
+    request_model,
+    date_from: datetime = None,
+    date_to: datetime = None,
+):
+    """Построчно выдавать заявки с контрагентом и автором.
+
+    Строки читаются серверным курсором пачками по EXPORT_YIELD_PER, поэтому
+    память не зависит от размера таблицы. Границы периода: date_from
+    включительно, date_to не включительно.
+    """
+
+    query = (
+        select(
+            request_model.id,
+            request_model.created_at,
+            User.username,
+            User.telegram_id,
+            Counterparty.name,
+            Counterparty.phone_or_card,
+            Counterparty.bank,
+            request_model.amount,
+            request_model.comment,
+            request_model.status,
+        )
+        .join(User, request_model.user_id == User.id)
+        .outerjoin(
+            Counterparty, request_model.counterparty_id == Counterparty.id
+        )
+        .order_by(request_model.id)
+        .execution_options(yield_per=EXPORT_YIELD_PER)
+    )
+    if date_from is not None:
+        query = query.where(request_model.created_at >= date_from)
+    if date_to is not None:
+        query = query.where(request_model.created_at < date_to)
+    result = await db.stream(query)
+    async for row in result:
+        yield row
+
+
+# Отчеты.
+
+# Сколько контрагентов попадает в отчет по неоплаченным заявкам.
+REPORT_LIMIT = 10
+
+
+async def get_period_totals(
+    db: AsyncSession, date_from: date, date_to: date
+) -> dict:
+    """Итоги заявок за дни с date_from по date_to включительно.
+
+    Возвращает словарь {тип кассы: строка с суммами полей
+    DAILY_TOTAL_COLUMNS}.
+    """
+    table = DailyRequestTotal.__table__
+    rows = await db.execute(
+        select(
+            table.c.request_type,
+            *(
+                func.sum(table.c[column]).label(column)
+                for column in DAILY_TOTAL_COLUMNS
+            ),
+        )
+        .where(table.c.day.between(date_from, date_to))
+        .group_by(table.c.request_type)
+    )
+    return {row.request_type: row for row in rows}
+
+
+async def get_unpaid_totals_by_counterparty(
+    db: AsyncSession, request_model, limit: int = REPORT_LIMIT
+) -> list:
+    """Число и сумма неоплаченных заявок по контрагентам, крупные первыми."""
+
+    amount = func.sum(request_model.amount)
+    rows = await db.execute(
+        select(
+            Counterparty.name,
+            func.count(request_model.id).label("count"),
+            amount.label("amount"),
+        )
+        .outerjoin(
+            Counterparty, request_model.counterparty_id == Counterparty.id
+        )
+        .where(request_model.status.is_(False))
+        .group_by(Counterparty.id, Counterparty.name)
+        .order_by(amount.desc())
+        .limit(limit)
+    )
+    return rows.all()
+
+
+async def get_unpaid_totals_by_user(db: AsyncSession, request_model) -> list:
+    """Число и сумма неоплаченных заявок по авторам."""
+
+    amount = func.sum(request_model.amount)
+    rows = await db.execute(
+        select(
+            User.username,
+            func.count(request_model.id).label("count"),
+            amount.label("amount"),
+        )
+        .join(User, request_model.user_id == User.id)
+        .where(request_model.status.is_(False))
+        .group_by(User.id, User.username)
+        .order_by(amount.desc())
+    )
+    return rows.all()
@@ -1,19 +1,34 @@
 import os
 
 from dotenv import load_dotenv
+from models.metrics import (
+    register_pool_metrics,
+    register_query_metrics,
+    timed_pool_class,
+)
 from sqlalchemy import (
+    DDL,
     BigInteger,
     Boolean,
     Column,
+    Date,
+    DateTime,
     ForeignKey,
+    Index,
     Integer,
     String,
-    create_engine,
     event,
+    func,
 )
+from sqlalchemy.engine import make_url
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import (
+    AsyncAttrs,
+    async_sessionmaker,
+    create_async_engine,
+)
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship, sessionmaker
+from sqlalchemy.orm import relationship
 
 load_dotenv()
 
@@ -21,18 +36,78 @@ POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD")
 POSTGRES_USER = os.getenv("POSTGRES_USER")
 POSTGRES_DB = os.getenv("POSTGRES_DB")
 DB_HOST = os.getenv("DB_HOST")
-DATABASE_URL = (
-    f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{DB_HOST}/{POSTGRES_DB}"
+# Для локального запуска можно указать, например,
+# DATABASE_URL=sqlite+aiosqlite:///./cash_desk.db
+DATABASE_URL = os.getenv(
+    "DATABASE_URL",
+    f"postgresql+asyncpg://{POSTGRES_USER}:{POSTGRES_PASSWORD}"
+    f"@{DB_HOST}/{POSTGRES_DB}",
 )
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
+# Синхронные драйверы из адреса заменяются на асинхронные.
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+
+def get_async_url(database_url: str):
+    """Адрес базы данных с асинхронным драйвером."""
+
+    url = make_url(database_url)
+    return url.set(
+        drivername=ASYNC_DRIVERS.get(url.drivername, url.drivername)
+    )
+
+
+def get_engine_options(url) -> dict:
+    """Настройки пула соединений для движка."""
+
+    options = {
+        "poolclass": timed_pool_class(url),
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "pool_recycle": DB_POOL_RECYCLE,
+    }
+    # Для SQLite используется пул без ограничения размера.
+    if url.get_backend_name() != "sqlite":
+        options.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+        )
+    return options
+
+
+async_url = get_async_url(DATABASE_URL)
+engine = create_async_engine(async_url, **get_engine_options(async_url))
+register_pool_metrics(engine)
+register_query_metrics(engine)
+SessionLocal = async_sessionmaker(
+    bind=engine, autoflush=False, expire_on_commit=False
+)
+Base = declarative_base(cls=AsyncAttrs)
 
 
 class User(Base):
     __tablename__ = "users"
-    id = Column(BigInteger, primary_key=True, index=True)
+    # В SQLite автоинкремент работает только для INTEGER PRIMARY KEY.
+    id = Column(
+        BigInteger().with_variant(Integer, "sqlite"),
+        primary_key=True,
+        index=True,
+    )
     telegram_id = Column(String, unique=True, index=True)
     username = Column(String, unique=True, index=True)
     cash_balance = Column(Integer, default=0)
@@ -42,38 +117,157 @@ class User(Base):
 class Counterparty(Base):
     __tablename__ = "counterparties"
     id = Column(Integer, primary_key=True, index=True)
-    name = Column(String)
+    name = Column(String, index=True)
+    # Имя без учета регистра и лишних пробелов, по нему контрагенты
+    # уникальны. Заполняется из name, см. normalize_counterparty_name.
+    normalized_name = Column(String)
     phone_or_card = Column(String)
     bank = Column(String)
     is_individual = Column(Boolean)
 
+    __table_args__ = (
+        Index(
+            "ix_counterparties_normalized_name", normalized_name, unique=True
+        ),
+        # Триграммный индекс для нечеткого поиска по имени. Есть только в
+        # Postgres, в SQLite поиск идет по индексу в памяти процесса.
+        Index(
+            "ix_counterparties_name_trgm",
+            name,
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
+
 
 class CashRequest(Base):
     __tablename__ = "cash_requests"
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(BigInteger, ForeignKey("users.id"))
-    counterparty_id = Column(Integer, ForeignKey("counterparties.id"))
+    user_id = Column(BigInteger, ForeignKey("users.id"), index=True)
+    counterparty_id = Column(
+        Integer, ForeignKey("counterparties.id"), index=True
+    )
     amount = Column(Integer)
     comment = Column(String)
     status = Column(Boolean)
     check_file = Column(String)
-    user = relationship("User")
+    # Кассир, который взял заявку в оплату, и время захвата.
+    claimed_by = Column(
+        BigInteger,
+        ForeignKey("users.id", name="fk_cash_requests_claimed_by_users"),
+    )
+    claimed_at = Column(DateTime(timezone=True))
+    created_at = Column(
+        DateTime(timezone=True), server_default=func.now(), index=True
+    )
+    user = relationship("User", foreign_keys=[user_id])
     counterparty = relationship("Counterparty")
 
+    __table_args__ = (
+        # Частичный индекс для выборки неоплаченных заявок по порядку id.
+        Index(
+            "ix_cash_requests_unpaid",
+            id,
+            postgresql_where=status.is_(False),
+            sqlite_where=status.is_(False),
+        ),
+    )
+
 
 class NoCashRequest(Base):
     __tablename__ = "no_cash_request"
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(BigInteger, ForeignKey("users.id"))
-    counterparty_id = Column(Integer, ForeignKey("counterparties.id"))
+    user_id = Column(BigInteger, ForeignKey("users.id"), index=True)
+    counterparty_id = Column(
+        Integer, ForeignKey("counterparties.id"), index=True
+    )
     amount = Column(Integer)
     invoice_path = Column(String)
     comment = Column(String)
     status = Column(Boolean)
     payment_slip = Column(String)
-    user = relationship("User")
+    # Кассир, который взял заявку в оплату, и время захвата.
+    claimed_by = Column(
+        BigInteger,
+        ForeignKey("users.id", name="fk_no_cash_request_claimed_by_users"),
+    )
+    claimed_at = Column(DateTime(timezone=True))
+    created_at = Column(
+        DateTime(timezone=True), server_default=func.now(), index=True
+    )
+    user = relationship("User", foreign_keys=[user_id])
     counterparty = relationship("Counterparty")
 
+    __table_args__ = (
+        Index(
+            "ix_no_cash_request_unpaid",
+            id,
+            postgresql_where=status.is_(False),
+            sqlite_where=status.is_(False),
+        ),
+    )
+
+
+class BalanceMovement(Base):
+    """Движение по кассе пользователя.
+
+    Сумма со знаком: пополнение положительное, оплата отрицательная.
+    """
+
+    __tablename__ = "balance_movements"
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(
+        BigInteger, ForeignKey("users.id"), nullable=False, index=True
+    )
+    cash_desk = Column(String, nullable=False)
+    amount = Column(Integer, nullable=False)
+    reason = Column(String, nullable=False)
+    cash_request_id = Column(Integer, ForeignKey("cash_requests.id"))
+    no_cash_request_id = Column(Integer, ForeignKey("no_cash_request.id"))
+    created_at = Column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+
+
+class DailyRequestTotal(Base):
+    """Итоги заявок за день по типу кассы.
+
+    Строки обновляются в той же транзакции, что создание и оплата заявок,
+    поэтому отчет за период не перебирает сами заявки.
+    """
+
+    __tablename__ = "daily_request_totals"
+    day = Column(Date, primary_key=True)
+    # "cash" или "non_cash", как касса в balance_movements.
+    request_type = Column(String, primary_key=True)
+    created_count = Column(Integer, nullable=False, server_default="0")
+    created_amount = Column(BigInteger, nullable=False, server_default="0")
+    paid_count = Column(Integer, nullable=False, server_default="0")
+    paid_amount = Column(BigInteger, nullable=False, server_default="0")
+
+
+class NotificationOutbox(Base):
+    """Уведомление пользователю, ожидающее отправки.
+
+    Строки пишутся в одной транзакции с заявкой и удаляются после
+    доставки. next_attempt_at пустой, если попытки отправки исчерпаны.
+    """
+
+    __tablename__ = "notification_outbox"
+    id = Column(Integer, primary_key=True)
+    chat_id = Column(String, nullable=False)
+    text = Column(String, nullable=False)
+    # Сумма и контрагент заявки для сводного уведомления.
+    amount = Column(Integer)
+    counterparty_name = Column(String)
+    attempts = Column(Integer, nullable=False, server_default="0")
+    next_attempt_at = Column(
+        DateTime(timezone=True), server_default=func.now(), index=True
+    )
+    created_at = Column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+
 
 def validate_cash_request(mapper, connection, target):
     if target.status and not target.check_file:
@@ -89,8 +283,25 @@ def validate_nocash_request(mapper, connection, target):
         )
 
 
-event.listen(CashRequest, "before_update", validate_cash_request)
-event.listen(NoCashRequest, "before_update", validate_nocash_request)
+def normalize_counterparty_name(name: str):
+    """Ключ имени контрагента: пробелы схлопываются, регистр не важен."""
+    if name is None:
+        return None
+    return " ".join(name.split()).casefold()
+
 
+def set_normalized_name(mapper, connection, target):
+    target.normalized_name = normalize_counterparty_name(target.name)
 
-Base.metadata.create_all(bind=engine)
+
+event.listen(Counterparty, "before_insert", set_normalized_name)
+event.listen(Counterparty, "before_update", set_normalized_name)
+event.listen(CashRequest, "before_update", validate_cash_request)
+event.listen(NoCashRequest, "before_update", validate_nocash_request)
+event.listen(
+    Base.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(
+        dialect="postgresql"
+    ),
+)
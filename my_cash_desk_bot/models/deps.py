@@ -1,12 +1,45 @@
 from contextlib import asynccontextmanager
 
 from models.data_base import SessionLocal
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+
+class LazySession:
+    """Ленивая обертка над AsyncSession.
+
+    Сессия (а вместе с ней и соединение из пула) создается только при
+    первом обращении к ней из crud-функций. Если обработчик не работает с
+    базой данных, соединение не занимается вовсе.
+    """
+
+    def __init__(self, session_factory: async_sessionmaker = SessionLocal):
+        self._session_factory = session_factory
+        self._session = None
+
+    @property
+    def has_session(self) -> bool:
+        """Была ли сессия реально открыта."""
+        return self._session is not None
+
+    @property
+    def session(self) -> AsyncSession:
+        if self._session is None:
+            self._session = self._session_factory()
+        return self._session
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
 
 
 @asynccontextmanager
 async def get_db():
-    db = SessionLocal()
+    db = LazySession()
     try:
         yield db
     finally:
-        db.close()
+        await db.close()
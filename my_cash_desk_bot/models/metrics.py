@@ -0,0 +1,192 @@
+import logging
+import os
+import sys
+import time
+
+from greenlet import getcurrent
+from prometheus_client import Gauge, Histogram
+from sqlalchemy import event
+from sqlalchemy.engine import URL
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+DB_POOL_SIZE = Gauge("db_pool_size", "Размер пула соединений с БД.")
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out", "Количество выданных из пула соединений."
+)
+DB_POOL_OVERFLOW = Gauge(
+    "db_pool_overflow", "Количество соединений сверх размера пула."
+)
+DB_POOL_WAIT_SECONDS = Histogram(
+    "db_pool_wait_seconds",
+    "Время ожидания соединения из пула.",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30),
+)
+DB_QUERY_SECONDS = Histogram(
+    "db_query_seconds",
+    "Время выполнения SQL-запросов.",
+    ["function", "operation"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1),
+)
+DB_QUERY_ROWS = Histogram(
+    "db_query_rows",
+    "Количество строк, измененных запросом.",
+    ["function", "operation"],
+    buckets=(0, 1, 10, 100, 1000, 10000, 100000),
+)
+
+# Запросы дольше этого времени (в секундах) пишутся в лог.
+DB_SLOW_QUERY_SECONDS = float(os.getenv("DB_SLOW_QUERY_SECONDS", 0.5))
+# Функции этих модулей становятся метками запросов.
+QUERY_CALLER_MODULES = ("models.", "handlers.")
+# Модули, через которые запрос проходит, но которые его не вызывают.
+QUERY_SKIP_MODULES = ("models.data_base", "models.deps", "models.metrics")
+
+logger = logging.getLogger(__name__)
+
+
+class TimedPoolMixin:
+    """Замеряет время получения соединения из пула."""
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            DB_POOL_WAIT_SECONDS.observe(time.perf_counter() - start)
+
+
+def timed_pool_class(url: URL):
+    """Класс пула диалекта по умолчанию с замером времени ожидания."""
+
+    pool_class = url.get_dialect().get_pool_class(url)
+    return type(
+        f"Timed{pool_class.__name__}", (TimedPoolMixin, pool_class), {}
+    )
+
+
+def register_pool_metrics(engine: AsyncEngine):
+    """Подключить метрики пула соединений к движку."""
+
+    sync_engine = engine.sync_engine
+    checked_out = 0
+
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        nonlocal checked_out
+        checked_out += 1
+
+    def on_checkin(dbapi_connection, connection_record):
+        nonlocal checked_out
+        checked_out -= 1
+
+    # Обработчики переносятся и на пул, пересозданный после dispose().
+    event.listen(sync_engine.pool, "checkout", on_checkout)
+    event.listen(sync_engine.pool, "checkin", on_checkin)
+
+    DB_POOL_CHECKED_OUT.set_function(lambda: checked_out)
+    DB_POOL_SIZE.set_function(
+        lambda: getattr(sync_engine.pool, "size", lambda: 0)()
+    )
+    DB_POOL_OVERFLOW.set_function(
+        lambda: max(getattr(sync_engine.pool, "overflow", lambda: 0)(), 0)
+    )
+
+
+def _find_caller(frame):
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if module.startswith(QUERY_CALLER_MODULES) and (
+            module not in QUERY_SKIP_MODULES
+        ):
+            return f"{module}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return None
+
+
+def query_caller() -> str:
+    """Функция бота, из которой выполняется текущий запрос.
+
+    Асинхронный движок выполняет запросы в дочернем greenlet, стек
+    вызывающих корутин виден через кадр родительского greenlet.
+    """
+
+    caller = _find_caller(sys._getframe(1))
+    parent = getcurrent().parent
+    if caller is None and parent is not None:
+        caller = _find_caller(parent.gr_frame)
+    return caller or "other"
+
+
+class QueryStats:
+    """Сводка запросов по функциям для выдачи по команде."""
+
+    def __init__(self):
+        self._stats = {}
+
+    def record(self, key, seconds: float, rows: int):
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = [0, 0.0, 0.0, 0]
+        stats[0] += 1
+        stats[1] += seconds
+        stats[2] = max(stats[2], seconds)
+        stats[3] += max(rows, 0)
+
+    def clear(self):
+        self._stats.clear()
+
+    def format(self, limit: int = 15) -> str:
+        """Самые затратные по суммарному времени функции."""
+
+        top = sorted(
+            self._stats.items(), key=lambda item: item[1][1], reverse=True
+        )[:limit]
+        if not top:
+            return "Запросов пока не было."
+        lines = []
+        for (function, operation), (count, total, longest, rows) in top:
+            lines.append(
+                f"{function} {operation}: {count} шт., "
+                f"всего {total * 1000:.0f} мс, "
+                f"среднее {total / count * 1000:.1f} мс, "
+                f"макс. {longest * 1000:.1f} мс, строк {rows}"
+            )
+        return "\n".join(lines)
+
+
+query_stats = QueryStats()
+
+
+def register_query_metrics(engine: AsyncEngine):
+    """Замерять каждый SQL-запрос движка.
+
+    Время и число строк попадают в гистограммы с метками функции и типа
+    запроса, медленные запросы пишутся в лог. Для SELECT число строк
+    драйвер обычно не сообщает, такие запросы учитываются только по
+    времени.
+    """
+
+    sync_engine = engine.sync_engine
+
+    def before_execute(conn, cursor, statement, params, context, many):
+        context.query_started = time.perf_counter()
+
+    def after_execute(conn, cursor, statement, params, context, many):
+        seconds = time.perf_counter() - context.query_started
+        function = query_caller()
+        operation = statement.lstrip().split(None, 1)[0].upper()
+        rows = cursor.rowcount
+        DB_QUERY_SECONDS.labels(function, operation).observe(seconds)
+        if rows >= 0:
+            DB_QUERY_ROWS.labels(function, operation).observe(rows)
+        query_stats.record((function, operation), seconds, rows)
+        if seconds >= DB_SLOW_QUERY_SECONDS:
+            logger.warning(
+                "Медленный запрос в %s: %.3f с, строк %s: %s",
+                function,
+                seconds,
+                rows,
+                statement[:1000],
+            )
+
+    event.listen(sync_engine, "before_cursor_execute", before_execute)
+    event.listen(sync_engine, "after_cursor_execute", after_execute)
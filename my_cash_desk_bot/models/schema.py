@@ -0,0 +1,90 @@
+import asyncio
+import logging
+import os
+from pathlib import Path
+
+from models.data_base import Base
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+
+ALEMBIC_DIR = Path(__file__).resolve().parents[2] / "alembic"
+DB_AUTO_UPGRADE = os.getenv("DB_AUTO_UPGRADE", "false").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
+logger = logging.getLogger(__name__)
+
+
+class SchemaVersionError(RuntimeError):
+    """Версия схемы БД не совпадает с последней миграцией."""
+
+
+def get_alembic_config() -> Config:
+    config = Config()
+    config.set_main_option("script_location", str(ALEMBIC_DIR))
+    return config
+
+
+def get_head_revision() -> str:
+    """Последняя ревизия Alembic (читается из файлов миграций)."""
+    return ScriptDirectory(str(ALEMBIC_DIR)).get_current_head()
+
+
+async def get_db_revision(engine: AsyncEngine):
+    """Текущая ревизия базы данных или None, если ее нет."""
+
+    async with engine.connect() as conn:
+        try:
+            return await conn.scalar(
+                text("SELECT version_num FROM alembic_version")
+            )
+        except DBAPIError:
+            return None
+
+
+def _create_schema(connection) -> bool:
+    """Создать схему в пустой базе и отметить ее последней ревизией."""
+
+    if inspect(connection).get_table_names():
+        return False
+    Base.metadata.create_all(connection)
+    MigrationContext.configure(connection).stamp(
+        ScriptDirectory(str(ALEMBIC_DIR)), "head"
+    )
+    return True
+
+
+async def check_schema_version(
+    engine: AsyncEngine, auto_upgrade: bool = DB_AUTO_UPGRADE
+):
+    """Сверить версию схемы БД с последней миграцией.
+
+    При DB_AUTO_UPGRADE=true пустая база создается по моделям, а
+    устаревшая обновляется до последней миграции. Иначе при расхождении
+    выбрасывается SchemaVersionError.
+    """
+    head = get_head_revision()
+    current = await get_db_revision(engine)
+    if current == head:
+        return
+    if not auto_upgrade:
+        raise SchemaVersionError(
+            f"Версия схемы БД {current} не совпадает с {head}. "
+            "Выполните `alembic upgrade head` или включите DB_AUTO_UPGRADE."
+        )
+    if current is None:
+        async with engine.begin() as conn:
+            if await conn.run_sync(_create_schema):
+                logger.info("Схема БД создана, ревизия %s", head)
+                return
+    logger.info("Обновление схемы БД с %s до %s", current, head)
+    # env.py запускает свой цикл событий, поэтому миграции идут в потоке.
+    await asyncio.to_thread(command.upgrade, get_alembic_config(), "head")
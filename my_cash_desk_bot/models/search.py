@@ -0,0 +1,258 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import os
+import time
+from collections import Counter, OrderedDict
+
+from models.data_base import Counterparty, SessionLocal
+from sqlalchemy import func, literal, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = logging.getLogger(__name__)
+
+# Сколько подсказок возвращает поиск.
+SEARCH_LIMIT = 10
+# Минимальная доля триграмм запроса, найденных в имени.
+MIN_SIMILARITY = 0.5
+# Сколько имен оценивается, когда запрос совпадает с именами не целиком.
+MAX_CANDIDATES = 3000
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", 1024))
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", 30))
+# Как часто индекс в памяти полностью перестраивается, чтобы учесть
+# переименованных и удаленных контрагентов. Новые добавляются при каждом
+# поиске.
+NGRAM_INDEX_TTL = float(os.getenv("NGRAM_INDEX_TTL", 300))
+
+
+def trigrams(text: str, partial: bool = False) -> set:
+    """Триграммы слов строки, как в pg_trgm.
+
+    Каждое слово дополняется двумя пробелами в начале и одним в конце.
+    При partial=True последнее слово считается недописанным и в конце не
+    дополняется: так запрос "ром" совпадает с началом "ромашка".
+    """
+    words = text.lower().split()
+    grams = set()
+    for number, word in enumerate(words, start=1):
+        last = partial and number == len(words)
+        padded = f"  {word}" if last else f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _add(names: dict, postings: dict, counterparty_id: int, name: str):
+    names[counterparty_id] = name
+    for gram in trigrams(name or ""):
+        postings.setdefault(gram, set()).add(counterparty_id)
+
+
+def _build(rows) -> tuple:
+    """Имена и списки id по триграммам для строк (id, имя)."""
+
+    names, postings = {}, {}
+    for counterparty_id, name in rows:
+        _add(names, postings, counterparty_id, name)
+    return names, postings
+
+
+class NgramIndex:
+    """Триграммный индекс имен контрагентов в памяти процесса.
+
+    Используется там, где нет pg_trgm (SQLite). Сходство имени с запросом -
+    доля триграмм запроса, которые есть в имени.
+    """
+
+    def __init__(self):
+        self._names = {}
+        self._postings = {}
+        self._max_id = 0
+        self._built_at = None
+        self._lock = asyncio.Lock()
+        self._rebuild_task = None
+
+    def add(self, counterparty_id: int, name: str):
+        _add(self._names, self._postings, counterparty_id, name)
+        self._max_id = max(self._max_id, counterparty_id)
+
+    def build(self, rows):
+        """Собрать новый индекс и подменить им текущий."""
+        self._swap(*_build(rows))
+
+    def _swap(self, names: dict, postings: dict):
+        # Поиск идет в цикле событий без await, поэтому видит либо старый
+        # индекс, либо новый целиком.
+        self._names, self._postings = names, postings
+        self._max_id = max(names, default=0)
+
+    async def _rebuild(self, db: AsyncSession):
+        rows = (
+            await db.execute(select(Counterparty.id, Counterparty.name))
+        ).all()
+        # Сборка индекса на сотнях тысяч строк не блокирует бота.
+        self._swap(*await asyncio.to_thread(_build, rows))
+
+    async def _rebuild_in_background(self):
+        try:
+            async with SessionLocal() as db:
+                await self._rebuild(db)
+        except Exception:
+            logger.exception("Ошибка перестройки индекса поиска")
+        finally:
+            self._rebuild_task = None
+
+    async def refresh(self, db: AsyncSession):
+        """Догрузить новых контрагентов.
+
+        Первый вызов строит индекс, остальные ждут его. Потом индекс раз в
+        NGRAM_INDEX_TTL перестраивается в фоновой задаче, а поиск до ее
+        завершения идет по старому.
+        """
+        if self._built_at is None:
+            async with self._lock:
+                if self._built_at is None:
+                    await self._rebuild(db)
+                    self._built_at = time.monotonic()
+            return
+        now = time.monotonic()
+        if now - self._built_at > NGRAM_INDEX_TTL and not self._rebuild_task:
+            self._built_at = now
+            self._rebuild_task = asyncio.create_task(
+                self._rebuild_in_background()
+            )
+        # Контрагенты, добавленные после выборки для перестройки, догрузятся
+        # при следующем вызове: после подмены индекса _max_id меньше их id.
+        rows = await db.execute(
+            select(Counterparty.id, Counterparty.name).where(
+                Counterparty.id > self._max_id
+            )
+        )
+        for counterparty_id, name in rows:
+            self.add(counterparty_id, name)
+
+    def search(self, query: str, limit: int = SEARCH_LIMIT) -> list:
+        grams = trigrams(query, partial=True)
+        if not grams:
+            return []
+        postings = sorted(
+            (self._postings.get(gram, set()) for gram in grams), key=len
+        )
+        # Обычно запрос - правильно набранное начало имени. Если имен со
+        # всеми триграммами запроса хватает, остальные не оцениваются.
+        exact = postings[0].intersection(*postings[1:])
+        if len(exact) >= limit:
+            best = heapq.nsmallest(
+                limit, exact, key=lambda item: (len(self._names[item]), item)
+            )
+            return [
+                (counterparty_id, self._names[counterparty_id])
+                for counterparty_id in best
+            ]
+        # Имя со сходством не ниже MIN_SIMILARITY содержит хотя бы одну из
+        # любых len(grams) - required + 1 триграмм запроса, поэтому
+        # кандидаты берутся только из самых редких.
+        required = math.ceil(MIN_SIMILARITY * len(grams))
+        # Оценка кандидатов на Python дорога, поэтому их не больше
+        # MAX_CANDIDATES: сначала имена со всеми триграммами запроса, затем
+        # из самых редких триграмм, наиболее характерных для запроса. Если
+        # очередная триграмма не помещается, оставшиеся места делятся
+        # поровну между ней и более частыми.
+        candidates = set(exact)
+        rare = postings[: len(grams) - required + 1]
+        for number, posting in enumerate(rare):
+            room = MAX_CANDIDATES - len(candidates)
+            if len(posting) > room:
+                share = room // (len(rare) - number)
+                for other in rare[number:]:
+                    candidates.update(itertools.islice(other, share))
+                break
+            candidates.update(posting)
+        # Совпадения считаются пересечением множеств, без цикла по
+        # кандидатам на Python.
+        matches = Counter()
+        for posting in postings:
+            matches.update(candidates.intersection(posting))
+        best = heapq.nlargest(
+            limit,
+            (
+                (matched, -len(self._names[counterparty_id]), -counterparty_id)
+                for counterparty_id, matched in matches.items()
+                if matched >= required
+            ),
+        )
+        return [
+            (-counterparty_id, self._names[-counterparty_id])
+            for _, _, counterparty_id in best
+        ]
+
+
+class SearchCache:
+    """Короткоживущий кэш результатов поиска по префиксу."""
+
+    def __init__(self, maxsize: int = SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._results = OrderedDict()
+
+    def get(self, key):
+        entry = self._results.get(key)
+        if entry is None or entry[1] < time.monotonic():
+            self._results.pop(key, None)
+            return None
+        self._results.move_to_end(key)
+        return entry[0]
+
+    def set(self, key, results: list):
+        self._results[key] = (results, time.monotonic() + self.ttl)
+        self._results.move_to_end(key)
+        while len(self._results) > self.maxsize:
+            self._results.popitem(last=False)
+
+
+ngram_index = NgramIndex()
+search_cache = SearchCache()
+
+
+async def _search_trigram(db: AsyncSession, query: str, limit: int) -> list:
+    """Поиск по индексу pg_trgm."""
+
+    pattern = query.replace("/", "//").replace("%", "/%").replace("_", "/_")
+    rows = await db.execute(
+        select(Counterparty.id, Counterparty.name)
+        .where(
+            or_(
+                Counterparty.name.ilike(f"%{pattern}%", escape="/"),
+                literal(query).op("<%")(Counterparty.name),
+            )
+        )
+        .order_by(
+            func.word_similarity(query, Counterparty.name).desc(),
+            func.length(Counterparty.name),
+        )
+        .limit(limit)
+    )
+    return [tuple(row) for row in rows]
+
+
+async def search_counterparties(
+    db: AsyncSession, query: str, limit: int = SEARCH_LIMIT
+) -> list:
+    """Найти контрагентов с похожими именами.
+
+    Возвращает до limit пар (id, имя), самые похожие первыми.
+    """
+    query = " ".join(query.lower().split())
+    if not query:
+        return []
+    results = search_cache.get((query, limit))
+    if results is not None:
+        return results
+    if db.bind.dialect.name == "postgresql":
+        results = await _search_trigram(db, query, limit)
+    else:
+        await ngram_index.refresh(db)
+        results = ngram_index.search(query, limit)
+    search_cache.set((query, limit), results)
+    return results
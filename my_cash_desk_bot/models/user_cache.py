@@ -0,0 +1,84 @@
+import os
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", 1024))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", 60))
+
+# Ключ в Session.info со списком пользователей, которых нужно убрать из
+# кэша после коммита.
+INVALIDATE_KEY = "invalidate_user_ids"
+
+
+class UserCache:
+    """Ограниченный LRU-кэш зарегистрированных пользователей с TTL.
+
+    Хранит отсоединенные от сессии объекты User по telegram_id. Записи
+    старше ttl секунд считаются устаревшими, при переполнении удаляются
+    давно не использованные.
+    """
+
+    def __init__(self, maxsize: int = USER_CACHE_SIZE, ttl=USER_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._users = OrderedDict()
+        self._telegram_ids = {}
+
+    def get(self, telegram_id: str):
+        entry = self._users.get(telegram_id)
+        if entry is None:
+            return None
+        user, expires_at = entry
+        if expires_at < time.monotonic():
+            self.invalidate(telegram_id)
+            return None
+        self._users.move_to_end(telegram_id)
+        return user
+
+    def set(self, user):
+        self._users[user.telegram_id] = (user, time.monotonic() + self.ttl)
+        self._users.move_to_end(user.telegram_id)
+        self._telegram_ids[user.id] = user.telegram_id
+        while len(self._users) > self.maxsize:
+            _, (old_user, _) = self._users.popitem(last=False)
+            self._telegram_ids.pop(old_user.id, None)
+
+    def invalidate(self, telegram_id: str):
+        entry = self._users.pop(telegram_id, None)
+        if entry is not None:
+            self._telegram_ids.pop(entry[0].id, None)
+
+    def invalidate_id(self, user_id: int):
+        telegram_id = self._telegram_ids.get(user_id)
+        if telegram_id is not None:
+            self.invalidate(telegram_id)
+
+    def clear(self):
+        self._users.clear()
+        self._telegram_ids.clear()
+
+
+user_cache = UserCache()
+
+
+def invalidate_on_commit(db, user_id: int):
+    """Убрать пользователя из кэша, когда транзакция db будет закоммичена.
+
+    Сброс сразу при изменении позволил бы параллельному обработчику снова
+    закэшировать строку до коммита.
+    """
+    db.info.setdefault(INVALIDATE_KEY, set()).add(user_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_users(session):
+    for user_id in session.info.pop(INVALIDATE_KEY, ()):
+        user_cache.invalidate_id(user_id)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_rolled_back_users(session, previous_transaction):
+    session.info.pop(INVALIDATE_KEY, None)
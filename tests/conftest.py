@@ -0,0 +1,15 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Модули бота импортируются так же, как при запуске cd_bot.py.
+sys.path.insert(
+    0, str(Path(__file__).resolve().parents[1] / "my_cash_desk_bot")
+)
+
+# Движок базы создается при импорте models.data_base, поэтому адрес
+# временной базы задается до импорта тестов.
+os.environ["DATABASE_URL"] = (
+    f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/test.db"
+)
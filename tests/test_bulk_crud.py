@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+from models import crud
+from models.data_base import (
+    BalanceMovement,
+    Base,
+    CashRequest,
+    NoCashRequest,
+    SessionLocal,
+    engine,
+)
+from sqlalchemy import func, select
+
+
+async def create_requests(db, model, count: int) -> tuple:
+    """Плательщик и неоплаченные заявки одного контрагента."""
+
+    user = await crud.create_user(db, "1", "cashier", 1000, 1000)
+    counterparty_id = await crud.upsert_counterparty(
+        db, "ООО Ромашка", "", "", False
+    )
+    bulk_create = {
+        CashRequest: crud.bulk_create_cash_requests,
+        NoCashRequest: crud.bulk_create_no_cash_requests,
+    }[model]
+    request_ids = await bulk_create(
+        db,
+        [
+            {
+                "user_id": user.id,
+                "counterparty_id": counterparty_id,
+                "amount": 100,
+                "comment": "",
+                "status": False,
+            }
+            for _ in range(count)
+        ],
+    )
+    return user.id, request_ids
+
+
+async def run(check):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    try:
+        async with SessionLocal() as db:
+            return await check(db)
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.parametrize(
+    "payer, document",
+    [(None, "check.jpg"), ("payer", None), ("payer", ""), ("payer", {})],
+)
+def test_paying_without_payer_or_document_is_rejected(payer, document):
+    async def check(db):
+        payer_id, request_ids = await create_requests(db, CashRequest, 2)
+        with pytest.raises(ValueError):
+            await crud.bulk_update_status(
+                db,
+                CashRequest,
+                request_ids,
+                True,
+                payer_id=payer_id if payer else None,
+                document=document,
+            )
+        return await db.scalar(
+            select(func.count()).where(CashRequest.status.is_(True))
+        )
+
+    assert asyncio.run(run(check)) == 0
+
+
+def test_paying_writes_documents_and_balance_movements():
+    async def check(db):
+        payer_id, request_ids = await create_requests(db, NoCashRequest, 3)
+        documents = {
+            request_id: f"slip{request_id}" for request_id in request_ids
+        }
+        updated = await crud.bulk_update_status(
+            db,
+            NoCashRequest,
+            request_ids,
+            True,
+            payer_id=payer_id,
+            document=documents,
+        )
+        slips = dict(
+            (
+                await db.execute(
+                    select(NoCashRequest.id, NoCashRequest.payment_slip)
+                )
+            ).all()
+        )
+        movements = await db.scalar(
+            select(func.count()).where(
+                BalanceMovement.no_cash_request_id.is_not(None)
+            )
+        )
+        balance = await crud.get_user_non_cash_balance(db, "1")
+        return updated, documents, slips, movements, balance
+
+    updated, documents, slips, movements, balance = asyncio.run(run(check))
+
+    assert sorted(updated) == sorted(documents)
+    assert slips == documents
+    assert movements == 3
+    assert balance == 1000 - 3 * 100
@@ -0,0 +1,56 @@
+import asyncio
+
+from handlers.outbound import BACKGROUND, INTERACTIVE, OutboundScheduler
+
+
+async def send_order(scheduler: OutboundScheduler, sends) -> list:
+    """Порядок, в котором планировщик разрешил отправки (чат, приоритет)."""
+
+    order = []
+
+    async def send(chat_id, priority):
+        await scheduler.acquire(chat_id, priority)
+        order.append((chat_id, priority))
+
+    background = [
+        asyncio.create_task(send(chat_id, priority))
+        for chat_id, priority in sends
+        if priority == BACKGROUND
+    ]
+    # Ответ приходит, когда фоновые отправки уже ждут в очереди.
+    await asyncio.sleep(0.01)
+    await asyncio.gather(
+        *background,
+        *(
+            send(chat_id, priority)
+            for chat_id, priority in sends
+            if priority == INTERACTIVE
+        ),
+    )
+    return order
+
+
+def test_reply_overtakes_background_to_same_chat_with_string_id():
+    # Уведомления из очереди идут со строковым id чата, ответ - с числовым.
+    scheduler = OutboundScheduler(rate=1000, chat_interval=0.05, chat_burst=1)
+    sends = [("111", BACKGROUND)] * 3 + [(111, INTERACTIVE)]
+
+    order = asyncio.run(send_order(scheduler, sends))
+
+    # Первое уведомление уходит сразу, следующее место в лимите чата
+    # достается ответу.
+    assert order[:2] == [("111", BACKGROUND), (111, INTERACTIVE)]
+
+
+def test_string_and_int_chat_ids_share_chat_limit():
+    scheduler = OutboundScheduler(rate=1000, chat_interval=10, chat_burst=1)
+
+    async def second_send_waits():
+        await scheduler.acquire("111", BACKGROUND)
+        reply = asyncio.create_task(scheduler.acquire(111, INTERACTIVE))
+        await asyncio.sleep(0.05)
+        waits = not reply.done()
+        reply.cancel()
+        return waits
+
+    assert asyncio.run(second_send_waits())
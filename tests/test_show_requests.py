@@ -0,0 +1,129 @@
+import asyncio
+from contextlib import contextmanager
+
+from handlers.show_requests import (
+    show_unpaid_cash_requests_handler,
+    show_unpaid_noncash_requests_handler,
+)
+from handlers.ultils import PAGE_SIZE
+from models.data_base import (
+    Base,
+    CashRequest,
+    Counterparty,
+    NoCashRequest,
+    SessionLocal,
+    User,
+    engine,
+)
+from sqlalchemy import event
+
+# Запрос страницы вместе с контрагентами и авторами и запрос количества.
+STATEMENTS_PER_PAGE = 2
+
+
+class FakeUser:
+    id = 1
+
+
+class FakeMessage:
+    """Сообщение, которое запоминает ответы вместо отправки."""
+
+    from_user = FakeUser()
+
+    def __init__(self):
+        self.answers = []
+
+    async def answer(self, text, **kwargs):
+        self.answers.append(text)
+
+
+class FakeState:
+    async def set_state(self, state):
+        pass
+
+
+@contextmanager
+def count_statements():
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(
+        engine.sync_engine, "before_cursor_execute", before_cursor_execute
+    )
+    try:
+        yield statements
+    finally:
+        event.remove(
+            engine.sync_engine, "before_cursor_execute", before_cursor_execute
+        )
+
+
+async def create_requests(model, count: int):
+    """Неоплаченные заявки, у каждой свой автор и контрагент."""
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    async with SessionLocal() as db:
+        for number in range(count):
+            user = User(telegram_id=str(number + 1), username=f"user{number}")
+            counterparty = Counterparty(
+                name=f"ООО {number}", normalized_name=f"ооо {number}"
+            )
+            db.add(
+                model(
+                    user=user,
+                    counterparty=counterparty,
+                    amount=100,
+                    comment="",
+                    status=False,
+                )
+            )
+        await db.commit()
+
+
+async def page_statements(handler, **page) -> tuple:
+    """Число SQL-запросов и ответов при показе одной страницы."""
+
+    message = FakeMessage()
+    async with SessionLocal() as db:
+        with count_statements() as statements:
+            await handler(message, FakeState(), db, **page)
+    return len(statements), len(message.answers)
+
+
+async def list_pages(model, handler):
+    await create_requests(model, PAGE_SIZE + 2)
+    try:
+        return [
+            await page_statements(handler),
+            await page_statements(handler, page=1, after_id=PAGE_SIZE),
+            await page_statements(handler, before_id=PAGE_SIZE + 1),
+        ]
+    finally:
+        await engine.dispose()
+
+
+def check_constant_statements(model, handler):
+    pages = asyncio.run(list_pages(model, handler))
+    # Сообщение на каждую заявку и сообщение с навигацией.
+    assert [answers for _, answers in pages] == [
+        PAGE_SIZE + 1,
+        2 + 1,
+        PAGE_SIZE + 1,
+    ]
+    assert [statements for statements, _ in pages] == [
+        STATEMENTS_PER_PAGE
+    ] * len(pages)
+
+
+def test_cash_page_statements_do_not_depend_on_page_size():
+    check_constant_statements(CashRequest, show_unpaid_cash_requests_handler)
+
+
+def test_noncash_page_statements_do_not_depend_on_page_size():
+    check_constant_statements(
+        NoCashRequest, show_unpaid_noncash_requests_handler
+    )